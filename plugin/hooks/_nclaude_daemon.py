@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+Hook daemon: keeps one warm SQLite connection for the nclaude hooks.
+
+Hooks are short-lived processes fired on nearly every tool call, so each one
+used to pay for sqlite3.connect() plus a cold page cache. This daemon owns a
+single connection and answers one-line JSON requests over a Unix socket:
+
+    {"op": "new_messages", "sid": "cc-abc123", "last": 41, "limit": 2}
+    {"op": "new_count", "last": 41}
+    {"op": "save_metadata", "sid": "cc-abc123", "metadata": {...}}
+    {"op": "post_message", "sid": "cc-abc123", "type": "STATUS", "content": "..."}
+
+Hooks call request(); when the socket is missing it spawns the daemon in the
+background and returns None so the hook falls back to a direct connection.
+The daemon exits on its own after IDLE_TIMEOUT seconds without requests.
+
+Usage:
+    python3 _nclaude_daemon.py    # run in foreground
+"""
+import fcntl
+import os
+import socket
+import sys
+from datetime import datetime, timezone
+
+from _nclaude_hooks_common import dumps, loads
+
+# sqlite3 is imported where it's used: a hook answered by the daemon never
+# opens the DB itself, so it shouldn't pay for loading the module either.
+
+DB_PATH = os.path.expanduser("~/.nclaude/messages.db")
+STATE_DIR = "/tmp/nclaude-state"
+SOCK_PATH = STATE_DIR + "/sock"
+LOCK_PATH = STATE_DIR + "/sock.lock"
+
+# SQLite URI for read-only opens; only %, ? and # are special in the path
+DB_URI = "file:{}?mode=ro".format(
+    DB_PATH.replace("%", "%25").replace("?", "%3f").replace("#", "%23")
+)
+
+IDLE_TIMEOUT = 600.0  # seconds without a request before the daemon exits
+CLIENT_TIMEOUT = 0.5  # hooks must never hang on a wedged daemon
+
+# SOCK_SEQPACKET keeps message boundaries; macOS lacks it for AF_UNIX
+SOCK_TYPE = getattr(socket, "SOCK_SEQPACKET", socket.SOCK_STREAM)
+
+
+# =============================================================================
+# Queries (shared by the daemon and the hooks' direct-connect fallback)
+# =============================================================================
+
+# Hot-path SQL lives in constants: sqlite3 keys its per-connection prepared
+# statement cache on the SQL text, so the warm daemon connection never
+# re-parses these after the first call.
+NEW_MESSAGES_SQL = """SELECT id, timestamp, session_id, msg_type, content, recipient
+    FROM messages
+    WHERE id > ? AND room = 'nclaude' AND session_id != ?
+    ORDER BY id DESC LIMIT ?"""
+COUNT_NEW_MESSAGES_SQL = (
+    "SELECT COUNT(*) FROM messages WHERE id > ? AND room = 'nclaude' AND session_id != ?"
+)
+NEW_COUNT_SQL = "SELECT COUNT(*) FROM messages WHERE id > ? AND room = 'nclaude'"
+
+ROW_KEYS = ("id", "timestamp", "session_id", "msg_type", "content", "recipient")
+
+
+def new_messages(conn: "sqlite3.Connection", session_id: str, last_seen: int, limit: int) -> dict:
+    """Count new messages (excluding self-sent) and fetch the most recent ones.
+
+    Fetches limit+1 rows so the common case is answered by one index range
+    scan; COUNT(*) only runs when there are more new rows than that.
+    """
+    rows = conn.execute(NEW_MESSAGES_SQL, (last_seen, session_id, limit + 1)).fetchall()
+    if not rows:
+        return {"count": 0, "max_id": last_seen, "rows": []}
+
+    count = len(rows)
+    if count > limit:
+        count = conn.execute(COUNT_NEW_MESSAGES_SQL, (last_seen, session_id)).fetchone()[0]
+
+    return {
+        "count": count,
+        "max_id": rows[0][0],
+        "rows": [dict(zip(ROW_KEYS, r)) for r in rows[:limit]],
+    }
+
+
+def new_count(conn: "sqlite3.Connection", last_seen: int) -> dict:
+    """Count all new messages in the nclaude room."""
+    row = conn.execute(NEW_COUNT_SQL, (last_seen,)).fetchone()
+    return {"count": row[0] or 0}
+
+
+def save_metadata(conn: "sqlite3.Connection", session_id: str, metadata: dict) -> dict:
+    """Upsert session metadata (used by the PreCompact hook).
+
+    updated_at reuses the caller's last_activity stamp rather than formatting
+    a second timestamp for the same write.
+    """
+    now = metadata.get("last_activity") or datetime.now(timezone.utc).isoformat()
+    conn.execute(
+        """
+        INSERT OR REPLACE INTO session_metadata
+        (session_id, project_dir, last_activity, task_summary, claimed_files, pending_work, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        """,
+        (
+            session_id,
+            metadata.get("project_dir", ""),
+            now,
+            metadata.get("task_summary", ""),
+            dumps(metadata.get("claimed_files", [])).decode(),
+            dumps(metadata.get("pending_work", [])).decode(),
+            now,
+        ),
+    )
+    conn.commit()
+    return {"ok": True}
+
+
+def post_message(conn: "sqlite3.Connection", session_id: str, msg_type: str, content: str) -> dict:
+    """Append a message to the nclaude room."""
+    cur = conn.execute(
+        "INSERT INTO messages (room, session_id, msg_type, content, timestamp) VALUES ('nclaude', ?, ?, ?, ?)",
+        (session_id, msg_type, content, datetime.now(timezone.utc).isoformat()),
+    )
+    conn.commit()
+    return {"ok": True, "id": cur.lastrowid}
+
+
+def connect_readonly(timeout: float = 1.0) -> "sqlite3.Connection":
+    """Read-only connection for the hooks' direct (no daemon) path.
+
+    mode=ro skips writer bookkeeping on open; query_only guards against
+    accidental writes and temp_store keeps sort scratch space in memory.
+    """
+    import sqlite3
+
+    conn = sqlite3.connect(DB_URI, uri=True, timeout=timeout)
+    conn.execute("PRAGMA query_only=1")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+
+# =============================================================================
+# Client side (called from hooks)
+# =============================================================================
+
+def _recv_line(sock: socket.socket) -> bytes:
+    """Read one newline-terminated payload."""
+    data = b""
+    while not data.endswith(b"\n"):
+        chunk = sock.recv(65536)
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+
+def fetch_new_messages(session_id: str, last_seen: int, limit: int) -> dict | None:
+    """new_messages via the daemon, else over a read-only direct connection.
+
+    Returns None if the DB can't be read.
+    """
+    result = request({"op": "new_messages", "sid": session_id, "last": last_seen, "limit": limit})
+    if result is not None:
+        return result
+
+    import sqlite3
+
+    try:
+        conn = connect_readonly()
+        try:
+            return new_messages(conn, session_id, last_seen, limit)
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return None
+
+
+def fetch_new_count(last_seen: int) -> dict | None:
+    """new_count via the daemon, else over a read-only direct connection."""
+    result = request({"op": "new_count", "last": last_seen})
+    if result is not None:
+        return result
+
+    import sqlite3
+
+    try:
+        conn = connect_readonly()
+        try:
+            return new_count(conn, last_seen)
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return None
+
+
+def _daemon_argv() -> list:
+    """Command line that runs this module, from a plain file or a .pyz bundle."""
+    path = os.path.abspath(__file__)
+    if os.path.isfile(path):
+        return [sys.executable, path]
+    # Inside a zipapp: __file__ is <bundle>/_nclaude_daemon.py(c)
+    return [sys.executable, os.path.dirname(path), "_nclaude_daemon"]
+
+
+def spawn() -> None:
+    """Start the daemon detached from the hook's session."""
+    try:
+        devnull = os.devnull
+        os.posix_spawn(
+            sys.executable,
+            _daemon_argv(),
+            os.environ,
+            file_actions=[
+                (os.POSIX_SPAWN_OPEN, 0, devnull, os.O_RDONLY, 0),
+                (os.POSIX_SPAWN_OPEN, 1, devnull, os.O_WRONLY, 0),
+                (os.POSIX_SPAWN_OPEN, 2, devnull, os.O_WRONLY, 0),
+            ],
+            setsid=True,
+        )
+    except (AttributeError, NotImplementedError, OSError):
+        pass
+
+
+def request(payload: dict) -> dict | None:
+    """Send one request to the daemon.
+
+    Returns the decoded reply, or None if the daemon is unavailable (in which
+    case one is spawned for the next hook) or reported an error.
+    """
+    sock = socket.socket(socket.AF_UNIX, SOCK_TYPE)
+    sock.settimeout(CLIENT_TIMEOUT)
+    try:
+        try:
+            sock.connect(SOCK_PATH)
+        except (FileNotFoundError, ConnectionRefusedError):
+            spawn()
+            return None
+        sock.sendall(dumps(payload) + b"\n")
+        reply = loads(_recv_line(sock))
+    except (OSError, ValueError):
+        return None
+    finally:
+        sock.close()
+
+    if not isinstance(reply, dict) or "error" in reply:
+        return None
+    return reply
+
+
+# =============================================================================
+# Daemon side
+# =============================================================================
+
+def _connect() -> "sqlite3.Connection":
+    import sqlite3
+
+    conn = sqlite3.connect(DB_PATH, timeout=5.0, cached_statements=32)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")  # durable enough under WAL, no fsync per commit
+    conn.execute("PRAGMA busy_timeout=5000")
+    conn.execute("PRAGMA cache_size=-20000")
+
+    # The schema (tables, indexes, planner stats) belongs to the nclaude
+    # storage layer; the daemon only reads and appends.
+
+    # Prepare the hot statements up front so the first hook doesn't pay for it
+    conn.execute(NEW_MESSAGES_SQL, (-1, "", 0)).fetchall()
+    conn.execute(COUNT_NEW_MESSAGES_SQL, (-1, "")).fetchall()
+    conn.execute(NEW_COUNT_SQL, (-1,)).fetchall()
+    return conn
+
+
+def handle(conn: "sqlite3.Connection", req: dict) -> dict:
+    """Dispatch a single request against the warm connection."""
+    if not isinstance(req, dict):
+        return {"error": "Request must be a JSON object"}
+    op = req.get("op")
+    if op == "new_messages":
+        return new_messages(conn, req["sid"], int(req.get("last", 0)), int(req.get("limit", 5)))
+    if op == "new_count":
+        return new_count(conn, int(req.get("last", 0)))
+    if op == "save_metadata":
+        return save_metadata(conn, req["sid"], req.get("metadata", {}))
+    if op == "post_message":
+        return post_message(conn, req["sid"], req.get("type", "MSG"), req["content"])
+    return {"error": f"Unknown op: {op}"}
+
+
+def serve() -> None:
+    """Run the daemon until it has been idle for IDLE_TIMEOUT seconds."""
+    global dumps, loads
+
+    if not os.path.exists(DB_PATH):
+        return
+
+    import sqlite3
+
+    try:
+        import orjson  # pays for its import in a process that stays up
+    except ImportError:
+        pass
+    else:
+        dumps, loads = orjson.dumps, orjson.loads
+
+    os.makedirs(STATE_DIR, exist_ok=True)
+
+    # Only one daemon per machine: losers of the race just exit
+    lock_fd = os.open(LOCK_PATH, os.O_WRONLY | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        os.close(lock_fd)
+        return
+
+    # Connect before binding: a DB we can't use must not leave behind a
+    # socket that refuses every hook
+    try:
+        conn = _connect()
+    except sqlite3.Error:
+        os.close(lock_fd)
+        return
+
+    try:
+        os.unlink(SOCK_PATH)
+    except FileNotFoundError:
+        pass
+
+    server = socket.socket(socket.AF_UNIX, SOCK_TYPE)
+    try:
+        server.bind(SOCK_PATH)
+        os.chmod(SOCK_PATH, 0o600)
+        server.listen(16)
+        server.settimeout(IDLE_TIMEOUT)
+
+        while True:
+            try:
+                client, _ = server.accept()
+            except socket.timeout:
+                break
+
+            try:
+                client.settimeout(CLIENT_TIMEOUT)
+                req = loads(_recv_line(client))
+                try:
+                    reply = handle(conn, req)
+                except Exception as e:
+                    # One bad request must not take the daemon down for
+                    # every hook
+                    reply = {"error": str(e)}
+                client.sendall(dumps(reply) + b"\n")
+            except Exception:
+                pass
+            finally:
+                client.close()
+    finally:
+        conn.close()
+        server.close()
+        try:
+            os.unlink(SOCK_PATH)
+        except FileNotFoundError:
+            pass
+        os.close(lock_fd)
+
+
+if __name__ == "__main__":
+    serve()
@@ -0,0 +1,64 @@
+"""
+Helpers shared by the nclaude hook entrypoints.
+
+Hook input/output goes through the stdlib json module. Hooks are one-shot
+processes with tiny payloads, and importing orjson (which itself pulls in
+json, uuid and zoneinfo) costs more than it could save; the long-lived hook
+daemon switches to orjson when it's installed.
+"""
+import json
+import mmap
+import os
+import sys
+
+loads = json.loads
+
+
+def dumps(obj) -> bytes:
+    # Match orjson's compact, UTF-8 output
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+# Files at least this big are mmap'd rather than copied into memory
+MMAP_MIN_BYTES = 1 << 20
+
+
+def get_session_id(hook_input: dict) -> str:
+    """Extract session ID from hook input or environment."""
+    # Try Claude Code's session_id first
+    cc_session = hook_input.get("session_id", "")
+    if cc_session:
+        return f"cc-{cc_session[:12]}"
+
+    # Fall back to env var
+    return os.environ.get("NCLAUDE_ID", "default")
+
+
+def read_hook_input() -> dict:
+    """Parse the hook's JSON payload from stdin (raises ValueError if invalid)."""
+    return loads(sys.stdin.buffer.read())
+
+
+def emit(output: dict) -> None:
+    """Write a hook's JSON response to stdout."""
+    sys.stdout.buffer.write(dumps(output) + b"\n")
+    sys.stdout.flush()
+
+
+def map_file(path: str):
+    """Return a file's contents as bytes, or a read-only mmap when large.
+
+    Both support find(), slicing and bytes regexes. Missing or empty files
+    give b"".
+    """
+    try:
+        fd = os.open(path, os.O_RDONLY | os.O_CLOEXEC)
+    except OSError:
+        return b""
+    try:
+        size = os.fstat(fd).st_size
+        if size >= MMAP_MIN_BYTES:
+            return mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+        return os.read(fd, size) if size else b""
+    finally:
+        os.close(fd)
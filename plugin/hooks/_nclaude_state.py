@@ -0,0 +1,65 @@
+"""
+Per-session "last seen message ID" state shared by the nclaude hooks.
+
+State lives in /tmp/nclaude-state/<session_id>.seen as a bare integer. Hooks
+fire on every tool call, so this uses raw os.open/os.read/os.write instead of
+pathlib + stdio, and only creates STATE_DIR once per process.
+"""
+import os
+import time
+
+STATE_DIR = "/tmp/nclaude-state"
+
+_state_dir_ready = False
+
+
+def _state_file(session_id: str, suffix: str = ".seen") -> str:
+    global _state_dir_ready
+    if not _state_dir_ready:
+        os.makedirs(STATE_DIR, exist_ok=True)
+        _state_dir_ready = True
+    return f"{STATE_DIR}/{session_id}{suffix}"
+
+
+def get_last_seen(session_id: str) -> int:
+    """Get last seen message ID for this session."""
+    try:
+        fd = os.open(_state_file(session_id), os.O_RDONLY | os.O_CLOEXEC)
+    except FileNotFoundError:
+        return 0
+    try:
+        return int(os.read(fd, 32).strip() or 0)
+    except ValueError:
+        return 0
+    finally:
+        os.close(fd)
+
+
+def set_last_seen(session_id: str, msg_id: int) -> None:
+    """Update last seen message ID."""
+    fd = os.open(
+        _state_file(session_id),
+        os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_CLOEXEC,
+        0o644,
+    )
+    try:
+        os.write(fd, str(msg_id).encode())
+    finally:
+        os.close(fd)
+
+
+def should_notify(session_id: str, interval: float) -> bool:
+    """True at most once per `interval` seconds for this session.
+
+    Uses the mtime of <session_id>.notify as the last-notified stamp.
+    """
+    stamp = _state_file(session_id, ".notify")
+    try:
+        if time.time() - os.stat(stamp).st_mtime < interval:
+            return False
+    except FileNotFoundError:
+        pass
+
+    os.close(os.open(stamp, os.O_WRONLY | os.O_CREAT | os.O_CLOEXEC, 0o644))
+    os.utime(stamp)
+    return True
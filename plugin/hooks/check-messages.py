@@ -4,76 +4,82 @@ PostToolUse hook: Check for new messages and notify (OS notification).
 Uses same state tracking as pretool-check.py for consistency.
 Does NOT mark as read - just notifies.
 """
-import json
 import os
-import sqlite3
-import subprocess
 import sys
-from pathlib import Path
 
-DB_PATH = Path.home() / ".nclaude" / "messages.db"
-STATE_DIR = Path("/tmp/nclaude-state")
+import _nclaude_daemon as daemon
+from _nclaude_hooks_common import get_session_id, read_hook_input
+from _nclaude_state import get_last_seen, should_notify
 
 
-def get_session_id(hook_input: dict) -> str:
-    cc_session = hook_input.get("session_id", "")
-    if cc_session:
-        return f"cc-{cc_session[:12]}"
-    return os.environ.get("NCLAUDE_ID", "default")
+# Coalesce OS notifications: at most one per session in this many seconds
+NOTIFY_INTERVAL = 10.0
 
 
-def get_last_seen(session_id: str) -> int:
-    STATE_DIR.mkdir(exist_ok=True)
-    state_file = STATE_DIR / f"{session_id}.seen"
-    try:
-        return int(state_file.read_text().strip())
-    except (FileNotFoundError, ValueError):
+def count_new_messages(session_id: str) -> int:
+    if not os.path.exists(daemon.DB_PATH):
         return 0
 
+    result = daemon.fetch_new_count(get_last_seen(session_id))
+    return result["count"] if result else 0
 
-def count_new_messages(session_id: str) -> int:
-    if not DB_PATH.exists():
-        return 0
 
-    last_seen = get_last_seen(session_id)
+def _notify_pyobjc(text: str) -> bool:
+    """Deliver in-process via pyobjc - no osascript fork+exec.
 
+    Returns False when that isn't possible, so the caller can fall back.
+    """
     try:
-        conn = sqlite3.connect(str(DB_PATH), timeout=1.0)
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT COUNT(*) FROM messages WHERE id > ? AND room = 'nclaude'",
-            (last_seen,)
-        )
-        count = cursor.fetchone()[0] or 0
-        conn.close()
-        return count
-    except sqlite3.Error:
-        return 0
+        from Foundation import NSUserNotification, NSUserNotificationCenter
+    except ImportError:
+        return False
 
+    try:
+        # None for a python3 that isn't running from an app bundle
+        center = NSUserNotificationCenter.defaultUserNotificationCenter()
+        if center is None:
+            return False
+        note = NSUserNotification.alloc().init()
+        note.setTitle_("nclaude")
+        note.setInformativeText_(text)
+        note.setSoundName_("Glass")
+        center.deliverNotification_(note)
+    except Exception:
+        return False
+    return True
+
+
+def notify(session_id: str, count: int):
+    """Send OS notification (rate-limited per session)."""
+    if sys.platform != "darwin" or not should_notify(session_id, NOTIFY_INTERVAL):
+        return
+
+    text = f"{count} new message(s) - run /ncheck"
+    if _notify_pyobjc(text):
+        return
+
+    import subprocess  # only needed here, and only on macOS
 
-def notify(count: int):
-    """Send OS notification."""
-    if sys.platform == "darwin":
-        try:
-            subprocess.run([
-                "osascript", "-e",
-                f'display notification "{count} new message(s) - run /ncheck" with title "nclaude" sound name "Glass"'
-            ], capture_output=True, timeout=2)
-        except:
-            pass
+    try:
+        subprocess.run([
+            "osascript", "-e",
+            f'display notification "{text}" with title "nclaude" sound name "Glass"'
+        ], capture_output=True, timeout=2)
+    except:
+        pass
 
 
 def main():
     try:
-        hook_input = json.load(sys.stdin)
-    except json.JSONDecodeError:
+        hook_input = read_hook_input()
+    except ValueError:
         sys.exit(0)
 
     session_id = get_session_id(hook_input)
     count = count_new_messages(session_id)
 
     if count > 0:
-        notify(count)
+        notify(session_id, count)
         print(f"📨 {count} new message(s) - run /ncheck to read")
 
     sys.exit(0)
@@ -10,86 +10,170 @@ Extracts from transcript:
 
 This enables session resume and peer handoff.
 """
-import json
 import os
 import re
-import sqlite3
 import sys
 from datetime import datetime, timezone
-from pathlib import Path
 
-DB_PATH = Path.home() / ".nclaude" / "messages.db"
+import _nclaude_daemon as daemon
+from _nclaude_hooks_common import emit, get_session_id, read_hook_input
+
+try:
+    import re2  # linear-time DFA for the single pass over the whole transcript
+except ImportError:
+    re2 = None
+
+
+# Transcript scanners. Case-insensitivity is inline (?i) so the same patterns
+# work under both re2 and re.
+#
+# bucket -> (pattern, anchor literals every match of that pattern starts with)
+_BUCKET_SPECS = {
+    "task": (
+        r"(?i)(?:working on|implementing|fixing|building|creating|adding)[:\s]+([^\n]{10,100})",
+        ("working on", "implementing", "fixing", "building", "creating", "adding"),
+    ),
+    "goal": (
+        r"(?i)(?:task|goal|objective)[:\s]+([^\n]{10,100})",
+        ("task", "goal", "objective"),
+    ),
+    "intent": (
+        r"(?i)(?:let me|I'll|I will)[:\s]+([^\n]{10,100})",
+        ("let me", "i'll", "i will"),
+    ),
+    "claiming": (r"(?i)CLAIMING:\s*(\S+)", ("claiming:",)),
+    "released": (r"(?i)RELEASED:\s*(\S+)", ("released:",)),
+    "todo": (r"(?i)TODO[:\s]+([^\n]{5,100})", ("todo",)),
+    "needs": (
+        r"(?i)(?:need to|should|must)[:\s]+([^\n]{5,100})",
+        ("need to", "should", "must"),
+    ),
+}
+
+
+def _anchor_pattern(escape) -> str:
+    """All anchors in one alternation, one named group per bucket.
+
+    A hit's lastgroup then names its bucket directly.
+    """
+    return "(?i)" + "|".join(
+        "(?P<{}>{})".format(name, "|".join(escape(a) for a in anchors))
+        for name, (_, anchors) in _BUCKET_SPECS.items()
+    )
+
+
+_ANCHOR_PATTERN = _anchor_pattern(re.escape)
+# stdlib's (?i) also matches "i" against "İ" and "ı"; RE2's doesn't, and its
+# hits must cover every offset the stdlib bucket patterns could match at
+_RE2_ANCHOR_PATTERN = _anchor_pattern(lambda a: re.escape(a).replace("i", "[iİı]"))
+_ANCHOR_MAX = max(len(a) for _, anchors in _BUCKET_SPECS.values() for a in anchors)
+
+
+# RE2 only gets the one finditer() pass over the whole transcript. Its
+# match(text, pos) re-encodes a str on every call, so the per-anchor matches
+# always use stdlib re.
+_ANCHOR_RE = re2.compile(_RE2_ANCHOR_PATTERN) if re2 else re.compile(_ANCHOR_PATTERN)
+_ANCHOR_AT = re.compile(_ANCHOR_PATTERN)
+_BUCKETS = {name: re.compile(p) for name, (p, _) in _BUCKET_SPECS.items()}
+
+
+def _anchor_hits(transcript: str):
+    """Yield (bucket, offset) for every anchor literal, overlapping ones too.
+
+    finditer() resumes after each hit, so an anchor starting inside another
+    ("must" / "todo" in "mustodo") is found by re-checking those offsets.
+    """
+    for anchor in _ANCHOR_RE.finditer(transcript):
+        start, end = anchor.span()
+        yield anchor.lastgroup, start
+        # An overlapping anchor starts before `end`, so it ends before this
+        inner = _ANCHOR_AT.search(transcript, start + 1, end + _ANCHOR_MAX)
+        while inner and inner.start() < end:
+            yield inner.lastgroup, inner.start()
+            inner = _ANCHOR_AT.search(transcript, inner.start() + 1, end + _ANCHOR_MAX)
+
+
+def scan_transcript(transcript: str) -> dict[str, list[str]]:
+    """Collect every bucket's captures in a single pass over the transcript.
+
+    Finds all anchor literals at once, then tries the owning bucket's
+    pattern only at those offsets. Results match running findall() per
+    bucket, without walking the transcript once per pattern.
+    """
+    hits = {name: [] for name in _BUCKETS}
+    resume = dict.fromkeys(_BUCKETS, 0)
+
+    for name, start in _anchor_hits(transcript):
+        if start < resume[name]:
+            continue  # inside this bucket's previous match, as findall would skip
+        match = _BUCKETS[name].match(transcript, start)
+        if match:
+            hits[name].append(match.group(1))
+            resume[name] = match.end()
 
+    return hits
 
-def get_session_id(hook_input: dict) -> str:
-    cc_session = hook_input.get("session_id", "")
-    if cc_session:
-        return f"cc-{cc_session[:12]}"
-    return os.environ.get("NCLAUDE_ID", "default")
 
+def read_transcript(hook_input: dict) -> str:
+    """Inline transcript text, else the contents of the transcript_path file."""
+    transcript = hook_input.get("transcript_summary", "") or hook_input.get("transcript", "")
+    if transcript:
+        return transcript
+
+    path = hook_input.get("transcript_path")
+    if not path:
+        return ""
+    # Scanned as str so lengths and (?i) work on characters, which needs the
+    # whole decoded text in memory anyway; an mmap wouldn't save anything
+    try:
+        with open(os.path.expanduser(path), encoding="utf-8", errors="replace", newline="") as f:
+            return f.read()
+    except OSError:
+        return ""
 
-def extract_task_summary(transcript: str) -> str:
+
+def extract_task_summary(hits: dict[str, list[str]]) -> str:
     """Extract what user is working on from transcript."""
-    patterns = [
-        r"(?:working on|implementing|fixing|building|creating|adding)[:\s]+([^\n]{10,100})",
-        r"(?:task|goal|objective)[:\s]+([^\n]{10,100})",
-        r"(?:let me|I'll|I will)[:\s]+([^\n]{10,100})",
-    ]
-
-    for pattern in patterns:
-        match = re.search(pattern, transcript, re.IGNORECASE)
-        if match:
-            return match.group(1).strip()[:200]
+    for name in ("task", "goal", "intent"):
+        if hits[name]:
+            return hits[name][0].strip()[:200]
 
     return ""
 
 
-def extract_claimed_files(transcript: str) -> list[str]:
+def extract_claimed_files(hits: dict[str, list[str]]) -> list[str]:
     """Extract files that were claimed but not released."""
-    claims = set(re.findall(r"CLAIMING:\s*(\S+)", transcript, re.IGNORECASE))
-    releases = set(re.findall(r"RELEASED:\s*(\S+)", transcript, re.IGNORECASE))
+    claims = set(hits["claiming"])
+    releases = set(hits["released"])
     return list(claims - releases)
 
 
-def extract_pending_work(transcript: str) -> list[str]:
+def extract_pending_work(hits: dict[str, list[str]]) -> list[str]:
     """Extract TODO items or pending work from transcript."""
     pending = []
 
     # Look for TODO comments
-    todos = re.findall(r"TODO[:\s]+([^\n]{5,100})", transcript, re.IGNORECASE)
-    pending.extend(todos[:5])
+    pending.extend(hits["todo"][:5])
 
     # Look for "need to" or "should" patterns
-    needs = re.findall(r"(?:need to|should|must)[:\s]+([^\n]{5,100})", transcript, re.IGNORECASE)
-    pending.extend(needs[:3])
+    pending.extend(hits["needs"][:3])
 
     return pending[:5]  # Limit to 5 items
 
 
 def save_metadata(session_id: str, metadata: dict) -> bool:
     """Save session metadata to database."""
-    if not DB_PATH.exists():
+    if not os.path.exists(daemon.DB_PATH):
         return False
 
+    if daemon.request({"op": "save_metadata", "sid": session_id, "metadata": metadata}) is not None:
+        return True
+
+    import sqlite3  # direct fallback only
+
     try:
-        conn = sqlite3.connect(str(DB_PATH), timeout=2.0)
-        conn.execute(
-            """
-            INSERT OR REPLACE INTO session_metadata
-            (session_id, project_dir, last_activity, task_summary, claimed_files, pending_work, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-            """,
-            (
-                session_id,
-                metadata.get("project_dir", ""),
-                metadata.get("last_activity", ""),
-                metadata.get("task_summary", ""),
-                json.dumps(metadata.get("claimed_files", [])),
-                json.dumps(metadata.get("pending_work", [])),
-                datetime.now(timezone.utc).isoformat(),
-            ),
-        )
-        conn.commit()
+        conn = sqlite3.connect(daemon.DB_PATH, timeout=2.0)
+        daemon.save_metadata(conn, session_id, metadata)
         conn.close()
         return True
     except sqlite3.Error:
@@ -98,22 +182,23 @@ def save_metadata(session_id: str, metadata: dict) -> bool:
 
 def main():
     try:
-        hook_input = json.load(sys.stdin)
-    except json.JSONDecodeError:
+        hook_input = read_hook_input()
+    except ValueError:
         sys.exit(0)
 
     session_id = get_session_id(hook_input)
-    transcript = hook_input.get("transcript_summary", "") or hook_input.get("transcript", "")
+    transcript = read_transcript(hook_input)
 
     # Get working directory from hook input or environment
     project_dir = hook_input.get("cwd", "") or os.getcwd()
 
+    hits = scan_transcript(transcript)
     metadata = {
         "project_dir": project_dir,
         "last_activity": datetime.now(timezone.utc).isoformat(),
-        "task_summary": extract_task_summary(transcript),
-        "claimed_files": extract_claimed_files(transcript),
-        "pending_work": extract_pending_work(transcript),
+        "task_summary": extract_task_summary(hits),
+        "claimed_files": extract_claimed_files(hits),
+        "pending_work": extract_pending_work(hits),
     }
 
     if save_metadata(session_id, metadata):
@@ -121,7 +206,7 @@ def main():
         output = {
             "systemMessage": f"Session state saved for {session_id}"
         }
-        print(json.dumps(output))
+        emit(output)
 
     sys.exit(0)
 
@@ -1,44 +1,14 @@
 #!/usr/bin/env python3
 """
 Fast PreToolUse hook for nclaude message checking.
-Queries SQLite directly for speed - no subprocess spawning.
+Queries SQLite via the hook daemon (warm connection) - no subprocess spawning.
 """
-import json
 import os
-import sqlite3
 import sys
-from pathlib import Path
 
-DB_PATH = Path.home() / ".nclaude" / "messages.db"
-STATE_DIR = Path("/tmp/nclaude-state")
-
-
-def get_session_id(hook_input: dict) -> str:
-    """Extract session ID from hook input or environment."""
-    # Try Claude Code's session_id first
-    cc_session = hook_input.get("session_id", "")
-    if cc_session:
-        return f"cc-{cc_session[:12]}"
-
-    # Fall back to env var
-    return os.environ.get("NCLAUDE_ID", "default")
-
-
-def get_last_seen(session_id: str) -> int:
-    """Get last seen message ID for this session."""
-    STATE_DIR.mkdir(exist_ok=True)
-    state_file = STATE_DIR / f"{session_id}.seen"
-    try:
-        return int(state_file.read_text().strip())
-    except (FileNotFoundError, ValueError):
-        return 0
-
-
-def set_last_seen(session_id: str, msg_id: int):
-    """Update last seen message ID."""
-    STATE_DIR.mkdir(exist_ok=True)
-    state_file = STATE_DIR / f"{session_id}.seen"
-    state_file.write_text(str(msg_id))
+import _nclaude_daemon as daemon
+from _nclaude_hooks_common import emit, get_session_id, read_hook_input
+from _nclaude_state import get_last_seen, set_last_seen
 
 
 def check_new_messages(session_id: str) -> tuple[int, int, list[str]]:
@@ -46,66 +16,38 @@ def check_new_messages(session_id: str) -> tuple[int, int, list[str]]:
     Fast check for new messages.
     Returns: (new_count, max_id, messages)
     """
-    if not DB_PATH.exists():
+    if not os.path.exists(daemon.DB_PATH):
         return 0, 0, []
 
-    last_seen = get_last_seen(session_id)
-
-    try:
-        conn = sqlite3.connect(str(DB_PATH), timeout=1.0)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-
-        # Fast count check first (exclude self-sent messages)
-        cursor.execute(
-            "SELECT COUNT(*), MAX(id) FROM messages WHERE id > ? AND room = 'nclaude' AND session_id != ?",
-            (last_seen, session_id)
-        )
-        row = cursor.fetchone()
-        count = row[0] or 0
-        max_id = row[1] or last_seen
-
-        if count == 0:
-            conn.close()
-            return 0, max_id, []
-
-        # Only fetch the 2 most recent new messages (save tokens, exclude self-sent)
-        cursor.execute(
-            """SELECT id, timestamp, session_id, msg_type, content, recipient
-               FROM messages
-               WHERE id > ? AND room = 'nclaude' AND session_id != ?
-               ORDER BY id DESC LIMIT 2""",
-            (last_seen, session_id)
-        )
-
-        messages = []
-        for row in cursor.fetchall():
-            sender = row["session_id"]
-            msg_type = row["msg_type"]
-            content = row["content"]
-            recipient = row["recipient"]
-
-            # Format message
-            prefix = f"[{sender}]"
-            if msg_type != "MSG":
-                prefix += f" [{msg_type}]"
-            if recipient:
-                prefix += f" @{recipient}"
-
-            messages.append(f"{prefix} {content[:100]}")
-
-        conn.close()
-        return count, max_id, messages
-
-    except sqlite3.Error:
+    # Only fetch the 2 most recent new messages (save tokens, exclude self-sent)
+    result = daemon.fetch_new_messages(session_id, get_last_seen(session_id), 2)
+    if result is None:
         return 0, 0, []
 
+    messages = []
+    for row in result["rows"]:
+        sender = row["session_id"]
+        msg_type = row["msg_type"]
+        content = row["content"]
+        recipient = row["recipient"]
+
+        # Format message
+        prefix = f"[{sender}]"
+        if msg_type != "MSG":
+            prefix += f" [{msg_type}]"
+        if recipient:
+            prefix += f" @{recipient}"
+
+        messages.append(f"{prefix} {content[:100]}")
+
+    return result["count"], result["max_id"], messages
+
 
 def main():
     # Read hook input
     try:
-        hook_input = json.load(sys.stdin)
-    except json.JSONDecodeError:
+        hook_input = read_hook_input()
+    except ValueError:
         sys.exit(0)  # Invalid input, allow tool to proceed
 
     session_id = get_session_id(hook_input)
@@ -139,7 +81,7 @@ def main():
         }
     }
 
-    print(json.dumps(output))
+    emit(output)
     sys.exit(0)
 
 
@@ -8,89 +8,55 @@ Enhanced features (v3.0):
 - Topic-based peer suggestions
 - Hookify-compatible rules from ~/.claude/nclaude-rules.yaml
 """
-import json
 import os
 import re
-import sqlite3
 import sys
-from pathlib import Path
-from typing import Optional
 
-DB_PATH = Path.home() / ".nclaude" / "messages.db"
-STATE_DIR = Path("/tmp/nclaude-state")
-RULES_PATH = Path.home() / ".claude" / "nclaude-rules.yaml"
+import _nclaude_daemon as daemon
+from _nclaude_hooks_common import emit, get_session_id, map_file, read_hook_input
+from _nclaude_state import get_last_seen
 
+try:
+    import re2  # linear-time matching for user-supplied rule patterns
+except ImportError:
+    re2 = None
 
-def get_session_id(hook_input: dict) -> str:
-    cc_session = hook_input.get("session_id", "")
-    if cc_session:
-        return f"cc-{cc_session[:12]}"
-    return os.environ.get("NCLAUDE_ID", "default")
+RULES_PATH = os.path.expanduser("~/.claude/nclaude-rules.yaml")
 
-
-def get_last_seen(session_id: str) -> int:
-    STATE_DIR.mkdir(exist_ok=True)
-    state_file = STATE_DIR / f"{session_id}.seen"
-    try:
-        return int(state_file.read_text().strip())
-    except (FileNotFoundError, ValueError):
-        return 0
+# Transcripts shorter than this can't show a stuck loop worth flagging
+MIN_TRANSCRIPT_CHARS = 512
 
 
 def check_new_messages(session_id: str) -> tuple[int, list[str]]:
-    if not DB_PATH.exists():
+    if not os.path.exists(daemon.DB_PATH):
         return 0, []
 
-    last_seen = get_last_seen(session_id)
-
-    try:
-        conn = sqlite3.connect(str(DB_PATH), timeout=1.0)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-
-        # Count new messages (exclude self-sent)
-        cursor.execute(
-            "SELECT COUNT(*) FROM messages WHERE id > ? AND room = 'nclaude' AND session_id != ?",
-            (last_seen, session_id)
-        )
-        count = cursor.fetchone()[0] or 0
-
-        if count == 0:
-            conn.close()
-            return 0, []
-
-        # Fetch recent messages for display (exclude self-sent)
-        cursor.execute(
-            """SELECT session_id, msg_type, content, recipient
-               FROM messages
-               WHERE id > ? AND room = 'nclaude' AND session_id != ?
-               ORDER BY id DESC LIMIT 5""",
-            (last_seen, session_id)
-        )
-
-        messages = []
-        for row in cursor.fetchall():
-            sender = row["session_id"]
-            msg_type = row["msg_type"]
-            content = row["content"][:150]
-            prefix = f"[{sender}]"
-            if msg_type != "MSG":
-                prefix += f" [{msg_type}]"
-            messages.append(f"{prefix} {content}")
-
-        conn.close()
-        return count, messages
-
-    except sqlite3.Error:
+    # Count new messages and fetch recent ones for display (exclude self-sent)
+    result = daemon.fetch_new_messages(session_id, get_last_seen(session_id), 5)
+    if result is None:
         return 0, []
 
+    messages = []
+    for row in result["rows"]:
+        sender = row["session_id"]
+        msg_type = row["msg_type"]
+        content = row["content"][:150]
+        prefix = f"[{sender}]"
+        if msg_type != "MSG":
+            prefix += f" [{msg_type}]"
+        messages.append(f"{prefix} {content}")
+
+    return result["count"], messages
+
 
-# Built-in stuck patterns
+# Built-in stuck patterns: (tokens, repeats, max gap between hits, description)
+# A pattern fires when one of its tokens occurs `repeats` times in a row with
+# at most `max gap` characters between consecutive hits.
 STUCK_PATTERNS = [
-    (r"(error|failed).{0,200}\1.{0,200}\1", "Same error 3+ times"),
-    (r"(AttributeError|TypeError|ImportError).{0,300}\1", "Repeated Python exception"),
-    (r"(command not found).{0,200}\1", "Command not found loop"),
-    (r"(permission denied).{0,200}\1", "Permission issues"),
+    (("error", "failed"), 3, 200, "Same error 3+ times"),
+    (("attributeerror", "typeerror", "importerror"), 2, 300, "Repeated Python exception"),
+    (("command not found",), 2, 200, "Command not found loop"),
+    (("permission denied",), 2, 200, "Permission issues"),
 ]
 
 # Built-in topic -> peer mappings
@@ -103,12 +69,34 @@ TOPIC_PEERS = {
     r"react|vue|angular|frontend|css|html": "@frontend",
 }
 
+# Both checks are single passes over the transcript. The lookahead makes
+# finditer report every start position, so overlapping hits (e.g. "error"
+# inside "typeerror") are not swallowed by an earlier match.
+_STUCK_TOKENS = sorted({t for tokens, _, _, _ in STUCK_PATTERNS for t in tokens}, key=len, reverse=True)
+_STUCK_RE = re.compile("(?=(" + "|".join(re.escape(t) for t in _STUCK_TOKENS) + "))")
+
+_TOPIC_LIST = list(TOPIC_PEERS.values())
+_TOPIC_RE = re.compile(
+    "(?=(?:" + "|".join(f"(?P<t{i}>{p})" for i, p in enumerate(TOPIC_PEERS)) + "))"
+)
+
 
 def load_rules() -> list[dict]:
-    """Load rules from YAML config file."""
-    if not RULES_PATH.exists():
+    """Load rules from YAML config file, compiling each rule's pattern once."""
+    if not os.path.exists(RULES_PATH):
         return []
 
+    rules = [r for r in _read_rules() if isinstance(r, dict)]
+    for rule in rules:
+        pattern = (rule.get("match") or {}).get("pattern", "")
+        try:
+            rule["_compiled"] = _compile_rule(pattern) if pattern else None
+        except re.error:
+            rule["_compiled"] = None
+    return rules
+
+
+def _read_rules() -> list[dict]:
     try:
         import yaml
         with open(RULES_PATH) as f:
@@ -121,49 +109,65 @@ def load_rules() -> list[dict]:
         return []
 
 
-def _parse_rules_simple(path: Path) -> list[dict]:
-    """Simple rule parser without PyYAML dependency."""
+# Keys understood by the fallback parser, and which dict they land in
+_RULE_KEYS = (b"enabled", b"event", b"peer", b"message")
+_MATCH_KEYS = (b"field", b"pattern", b"type")
+
+
+def _parse_rules_simple(path: str) -> list[dict]:
+    """Simple rule parser without PyYAML dependency.
+
+    Single pass over the raw bytes (mmap'd when large): walks newline offsets
+    instead of building a list of lines, and only decodes values for keys we
+    actually use.
+    """
     rules = []
     try:
-        content = path.read_text()
+        data = map_file(path)
         # Very basic YAML parsing for our format
         current_rule = {}
         current_match = {}
 
-        for line in content.split("\n"):
-            line = line.rstrip()
-            if not line or line.startswith("#"):
+        pos, end = 0, len(data)
+        while pos < end:
+            nl = data.find(b"\n", pos)
+            if nl == -1:
+                nl = end
+            line = data[pos:nl].strip()
+            pos = nl + 1
+
+            if not line or line.startswith(b"#"):
                 continue
 
             # Rule start
-            if line.strip() == "- name:":
-                continue
-            if line.strip().startswith("- name:"):
+            if line.startswith(b"- name:"):
+                name = line[7:].strip()
+                if not name:
+                    continue
                 if current_rule and current_rule.get("enabled", True):
                     if current_match:
                         current_rule["match"] = current_match
                     rules.append(current_rule)
-                current_rule = {"name": line.split(":", 1)[1].strip()}
+                current_rule = {"name": name.decode()}
                 current_match = {}
-            elif ":" in line:
-                key, value = line.strip().split(":", 1)
-                key = key.strip()
-                value = value.strip().strip('"').strip("'")
-
-                if key == "enabled":
-                    current_rule["enabled"] = value.lower() == "true"
-                elif key == "event":
-                    current_rule["event"] = value
-                elif key == "peer":
-                    current_rule["peer"] = value
-                elif key == "message":
-                    current_rule["message"] = value
-                elif key == "field":
-                    current_match["field"] = value
-                elif key == "pattern":
-                    current_match["pattern"] = value
-                elif key == "type":
-                    current_match["type"] = value
+                continue
+
+            colon = line.find(b":")
+            if colon == -1:
+                continue
+            key = line[:colon].rstrip()
+            if key in _RULE_KEYS:
+                target = current_rule
+            elif key in _MATCH_KEYS:
+                target = current_match
+            else:
+                continue
+
+            value = line[colon + 1:].strip().strip(b'"').strip(b"'").decode()
+            if key == b"enabled":
+                target["enabled"] = value.lower() == "true"
+            else:
+                target[key.decode()] = value
 
         # Don't forget last rule
         if current_rule and current_rule.get("enabled", True):
@@ -177,6 +181,16 @@ def _parse_rules_simple(path: Path) -> list[dict]:
     return rules
 
 
+def _compile_rule(pattern: str):
+    """Compile a rule pattern, preferring RE2 when it supports the syntax."""
+    if re2 is not None:
+        try:
+            return re2.compile("(?i)" + pattern)
+        except Exception:
+            pass  # backrefs/lookaround are re-only
+    return re.compile(pattern, re.IGNORECASE)
+
+
 def evaluate_rules(transcript: str) -> list[dict]:
     """Evaluate rules against transcript, return matched rules."""
     matched = []
@@ -192,53 +206,52 @@ def evaluate_rules(transcript: str) -> list[dict]:
         if match_spec.get("field") != "transcript":
             continue
 
-        pattern = match_spec.get("pattern", "")
-        if not pattern:
-            continue
-
-        flags = re.IGNORECASE
-        try:
-            if re.search(pattern, transcript, flags):
-                matched.append(rule)
-        except re.error:
-            continue
+        compiled = rule.get("_compiled")
+        if compiled and compiled.search(transcript):
+            matched.append(rule)
 
     return matched
 
 
-def check_stuck_patterns(transcript: str) -> Optional[str]:
-    """Check if transcript shows stuck patterns."""
-    transcript_lower = transcript.lower()
+def _repeats_within(starts: list[int], length: int, repeats: int, gap: int) -> bool:
+    """True if `repeats` consecutive hits are each at most `gap` chars apart."""
+    run = 1
+    for prev, cur in zip(starts, starts[1:]):
+        run = run + 1 if cur - (prev + length) <= gap else 1
+        if run >= repeats:
+            return True
+    return False
 
-    for pattern, description in STUCK_PATTERNS:
-        try:
-            if re.search(pattern, transcript_lower, re.IGNORECASE | re.DOTALL):
+
+def check_stuck_patterns(transcript_lower: str) -> str | None:
+    """Check if the (already lowercased) transcript shows stuck patterns."""
+    hits: dict[str, list[int]] = {}
+    for m in _STUCK_RE.finditer(transcript_lower):
+        hits.setdefault(m.group(1), []).append(m.start())
+
+    for tokens, repeats, gap, description in STUCK_PATTERNS:
+        for token in tokens:
+            if _repeats_within(hits.get(token, []), len(token), repeats, gap):
                 return description
-        except re.error:
-            continue
 
     return None
 
 
-def check_topic_peers(transcript: str) -> list[str]:
-    """Check if transcript suggests topic-specific peers."""
-    transcript_lower = transcript.lower()
-    suggestions = []
+def check_topic_peers(transcript_lower: str) -> list[str]:
+    """Check if the (already lowercased) transcript suggests topic-specific peers."""
+    found = set()
+    for m in _TOPIC_RE.finditer(transcript_lower):
+        found.add(m.lastgroup)
+        if len(found) == len(_TOPIC_LIST):
+            break
 
-    for pattern, peer in TOPIC_PEERS.items():
-        try:
-            if re.search(pattern, transcript_lower, re.IGNORECASE):
-                suggestions.append(peer)
-        except re.error:
-            continue
-
-    return suggestions
+    return [peer for i, peer in enumerate(_TOPIC_LIST) if f"t{i}" in found]
 
 
 def main():
     try:
-        hook_input = json.load(sys.stdin)
-    except json.JSONDecodeError:
+        hook_input = read_hook_input()
+    except ValueError:
         sys.exit(0)
 
     session_id = get_session_id(hook_input)
@@ -251,25 +264,28 @@ def main():
             "decision": "block",
             "reason": f"STOP BLOCKED: {count} unread nclaude message(s). Run /nclaude:check to read:\n{msg_preview}"
         }
-        print(json.dumps(output))
+        emit(output)
         sys.exit(0)
 
     # Phase 2: Check transcript for stuck patterns and topic suggestions
     transcript = hook_input.get("transcript_summary", "") or hook_input.get("transcript", "")
 
-    if not transcript:
-        # No transcript data - allow stop
+    if len(transcript) < MIN_TRANSCRIPT_CHARS:
+        # No (or too little) transcript data - allow stop without scanning
         sys.exit(0)
 
     suggestions = []
 
+    # Built-in patterns are lowercase, so fold case once for both checks
+    transcript_lower = transcript.lower()
+
     # Check stuck patterns
-    stuck_reason = check_stuck_patterns(transcript)
+    stuck_reason = check_stuck_patterns(transcript_lower)
     if stuck_reason:
         suggestions.append(f"You appear stuck: {stuck_reason}. Consider asking a peer: /nclaude:send \"Need help with...\"")
 
     # Check topic-based peers
-    topic_peers = check_topic_peers(transcript)
+    topic_peers = check_topic_peers(transcript_lower)
     if topic_peers:
         peers_str = ", ".join(topic_peers[:3])  # Limit to 3
         suggestions.append(f"Topic experts available: {peers_str}")
@@ -290,7 +306,7 @@ def main():
         output = {
             "systemMessage": f"Before stopping, consider:\n{suggestion_text}"
         }
-        print(json.dumps(output))
+        emit(output)
 
     sys.exit(0)
 
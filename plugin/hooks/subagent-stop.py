@@ -6,22 +6,68 @@ When a Task subagent completes, sends STATUS message with:
 - Completion reason
 - Modified files (from git diff)
 """
-import json
 import os
 import subprocess
 import sys
-from pathlib import Path
 
+import _nclaude_daemon as daemon
+from _nclaude_hooks_common import read_hook_input
 
-def get_session_id(hook_input: dict) -> str:
-    cc_session = hook_input.get("session_id", "")
-    if cc_session:
-        return f"cc-{cc_session[:12]}"
-    return os.environ.get("NCLAUDE_ID", "default")
+try:
+    import pygit2  # in-process libgit2, no fork+exec of git
+except ImportError:
+    pygit2 = None
+
+
+def _undone(repo, delta, staged: set) -> bool:
+    """True for a staged change the working tree has put back again.
+
+    libgit2 only hashes a workdir file when its stat data is inconclusive,
+    so the file is hashed here to compare it with the HEAD~1 blob.
+    """
+    if delta.status_char() != "M" or delta.new_file.path not in staged:
+        return False
+    return pygit2.hashfile(os.path.join(repo.workdir, delta.new_file.path)) == delta.old_file.id
+
+
+def _diff_names_pygit2() -> list[str] | None:
+    """Same file list as the git subprocesses below, via pygit2.
+
+    `git diff HEAD~1` compares that commit with the working tree as seen
+    through the index, so this merges HEAD~1 -> index with index -> workdir,
+    as libgit2's tree-to-workdir-with-index does. Returns None when pygit2 is
+    missing or cwd isn't inside a repo, so the caller falls back to the git
+    CLI.
+    """
+    if pygit2 is None:
+        return None
+
+    try:
+        repo_path = pygit2.discover_repository(os.getcwd())
+        if not repo_path:
+            return None
+        repo = pygit2.Repository(repo_path)
+        try:
+            base = repo.revparse_single("HEAD~1").peel(pygit2.Tree)
+        except (KeyError, ValueError):
+            diff = repo.diff("HEAD", cached=True)  # staged files
+            staged = set()
+        else:
+            diff = base.diff_to_index(repo.index)
+            staged = {delta.new_file.path for delta in diff.deltas}
+            diff.merge(repo.index.diff_to_workdir())
+        diff.find_similar()  # git diff detects renames (diff.renames)
+        return [delta.new_file.path for delta in diff.deltas if not _undone(repo, delta, staged)]
+    except (pygit2.GitError, KeyError, ValueError, OSError):
+        return None
 
 
 def get_modified_files() -> list[str]:
     """Get files modified in last commit via git diff."""
+    files = _diff_names_pygit2()
+    if files is not None:
+        return files[:10]  # Limit to 10 files
+
     try:
         result = subprocess.run(
             ["git", "diff", "--name-only", "HEAD~1"],
@@ -52,8 +98,85 @@ def get_modified_files() -> list[str]:
     return []
 
 
-def send_status_message(message: str) -> bool:
-    """Send STATUS message via nclaude."""
+def _repo_and_branch_pygit2() -> tuple[str, str] | None:
+    """(toplevel dir name, current branch) via pygit2, like the git calls below.
+
+    The branch is "" when HEAD is detached, as `git branch --show-current`
+    prints. Returns None when pygit2 is missing or cwd isn't in a work tree.
+    """
+    if pygit2 is None:
+        return None
+
+    try:
+        repo_path = pygit2.discover_repository(os.getcwd())
+        if not repo_path:
+            return None
+        repo = pygit2.Repository(repo_path)
+        if repo.workdir is None:
+            return None
+        head = repo.lookup_reference("HEAD").target
+    except (pygit2.GitError, KeyError, ValueError, OSError):
+        return None
+    branch = head[11:] if isinstance(head, str) and head.startswith("refs/heads/") else ""
+    return os.path.basename(repo.workdir.rstrip("/")), branch
+
+
+def get_sender_id() -> str:
+    """Session ID `nclaude send` posts under: NCLAUDE_ID, else <repo>/<branch>-1."""
+    if "NCLAUDE_ID" in os.environ:
+        return os.environ["NCLAUDE_ID"]
+
+    info = _repo_and_branch_pygit2()
+    if info is None:
+        try:
+            result = subprocess.run(
+                ["git", "rev-parse", "--show-toplevel"],
+                capture_output=True,
+                text=True,
+                timeout=5,
+            )
+            if result.returncode != 0:
+                return "unknown/main-1"
+            branch = subprocess.run(
+                ["git", "branch", "--show-current"],
+                capture_output=True,
+                text=True,
+                timeout=5,
+            )
+            info = (
+                os.path.basename(result.stdout.strip()),
+                branch.stdout.strip() if branch.returncode == 0 else "main",
+            )
+        except (subprocess.TimeoutExpired, FileNotFoundError):
+            return "unknown/main-1"
+
+    repo_name, branch = info
+    return f"{repo_name}/{branch.replace('/', '-').replace(' ', '-')}-1"
+
+
+def send_status_message(session_id: str, message: str) -> bool:
+    """Post STATUS message to the nclaude room.
+
+    Writes straight to the message DB (via the hook daemon if it's up) rather
+    than forking `nclaude send`; the CLI is only used when there is no DB.
+    session_id should be the CLI's sender ID (get_sender_id), so peers see
+    the same sender either way.
+    """
+    if os.path.exists(daemon.DB_PATH):
+        req = {"op": "post_message", "sid": session_id, "type": "STATUS", "content": message}
+        if daemon.request(req) is not None:
+            return True
+
+        import sqlite3  # direct fallback only
+
+        try:
+            conn = sqlite3.connect(daemon.DB_PATH, timeout=2.0)
+            daemon.post_message(conn, session_id, "STATUS", message)
+            conn.close()
+            return True
+        except sqlite3.Error:
+            return False
+
     try:
         result = subprocess.run(
             ["nclaude", "send", message, "--type", "STATUS"],
@@ -68,11 +191,10 @@ def send_status_message(message: str) -> bool:
 
 def main():
     try:
-        hook_input = json.load(sys.stdin)
-    except json.JSONDecodeError:
+        hook_input = read_hook_input()
+    except ValueError:
         sys.exit(0)
 
-    session_id = get_session_id(hook_input)
     reason = hook_input.get("reason", "completed")
     subagent_type = hook_input.get("subagent_type", "unknown")
 
@@ -91,7 +213,7 @@ def main():
     message = " | ".join(msg_parts)
 
     # Send notification
-    send_status_message(message)
+    send_status_message(get_sender_id(), message)
 
     sys.exit(0)
 
@@ -11,6 +11,7 @@ from pathlib import Path
 
 # Message tag pattern: [NCLAUDE:sender_id:type:recipient] content
 NCLAUDE_TAG_PATTERN = r"\[NCLAUDE:([^:]+):([^:]+):([^\]]+)\]\s*(.+)"
+_NCLAUDE_TAG_RE = re.compile(NCLAUDE_TAG_PATTERN, re.DOTALL)
 
 # Default space (clawdz)
 DEFAULT_SPACE = "spaces/AAQAW237SHc"
@@ -57,7 +58,7 @@ def parse_message(text: str) -> dict | None:
     Returns:
         Parsed message dict or None if not an nclaude message
     """
-    match = re.match(NCLAUDE_TAG_PATTERN, text, re.DOTALL)
+    match = _NCLAUDE_TAG_RE.match(text)
     if not match:
         return None
 
@@ -8,6 +8,7 @@ Usage:
     python3 client.py recv [--timeout 5]
 """
 
+import itertools
 import json
 import os
 import re
@@ -16,13 +17,42 @@ import socket
 import sys
 import threading
 import queue
+from collections import deque
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Optional
+
+try:
+    import orjson
+
+    _loads = orjson.loads
+
+    def _dumps(msg: dict) -> bytes:
+        return orjson.dumps(msg)
+
+    def _dumps_line(msg: dict) -> bytes:
+        # Newline written by the encoder: no bytes concat per frame
+        return orjson.dumps(msg, option=orjson.OPT_APPEND_NEWLINE)
+
+except ImportError:
+    _loads = json.loads
+
+    def _dumps(msg: dict) -> bytes:
+        return json.dumps(msg, separators=(",", ":"), ensure_ascii=False).encode()
+
+    def _dumps_line(msg: dict) -> bytes:
+        return (json.dumps(msg, separators=(",", ":"), ensure_ascii=False) + "\n").encode()
+
 
 # Default socket path
 DEFAULT_SOCKET = Path("/tmp/nclaude/hub.sock")
 
+# Inbound messages kept for an idle consumer; the oldest are dropped past this
+MAX_QUEUED = 10_000
+
+_MENTION_RE = re.compile(r'@([\w-]+)')
+_MENTION_STRIP_RE = re.compile(r'@[\w-]+\s*')
+
 
 class HubClient:
     """Client for connecting to nclaude hub"""
@@ -32,7 +62,13 @@ class HubClient:
         self.socket_path = socket_path
         self.sock: Optional[socket.socket] = None
         self.connected = False
-        self.message_queue: queue.Queue = queue.Queue()
+        # Inbound messages; deque(maxlen) drops the oldest when full, and one
+        # Condition guards it so recv_all() drains in a single lock acquire
+        self.message_queue: deque = deque(maxlen=MAX_QUEUED)
+        self._queue_ready = threading.Condition()
+        # req_id -> one-shot reply queue for requests awaiting a hub response
+        self._pending: Dict[str, queue.Queue] = {}
+        self._req_ids = itertools.count(1)
         self.recv_thread: Optional[threading.Thread] = None
         self._stop_event = threading.Event()
 
@@ -46,20 +82,21 @@ class HubClient:
             self.sock.connect(str(self.socket_path))
             self.sock.setblocking(False)
 
-            # Register session
-            self._send({"type": "REGISTER", "session_id": self.session_id})
+            # Receive thread first, so anything the hub sends right after
+            # REGISTERED lands on message_queue instead of being lost
+            self._start_recv_thread()
 
-            # Wait for registration confirmation
-            response = self._recv_one(timeout=5.0)
+            # Register session and wait for the confirmation
+            response = self._request({"type": "REGISTER", "session_id": self.session_id})
             if response and response.get("type") == "REGISTERED":
                 self.connected = True
-                self._start_recv_thread()
                 return {
                     "connected": True,
                     "session_id": self.session_id,
                     "online": response.get("online", [])
                 }
             else:
+                self.disconnect()
                 return {"error": "Registration failed", "response": response}
 
         except Exception as e:
@@ -89,60 +126,50 @@ class HubClient:
         if to:
             msg["to"] = to
 
-        self._send(msg)
-
-        # Wait for confirmation
-        try:
-            response = self.message_queue.get(timeout=5.0)
-            if response.get("type") == "SENT":
-                return {"sent": True, "id": response.get("id"), "to": response.get("to")}
-            else:
-                # It's a received message, put it back
-                self.message_queue.put(response)
-                return {"sent": True, "id": "unknown"}
-        except queue.Empty:
+        response = self._request(msg)
+        if response is None:
             return {"sent": True, "id": "unconfirmed"}
+        return {"sent": True, "id": response.get("id"), "to": response.get("to")}
 
     def recv(self, timeout: float = 0.0) -> Optional[dict]:
         """Receive next message"""
-        try:
-            return self.message_queue.get(timeout=timeout if timeout > 0 else None)
-        except queue.Empty:
-            return None
+        with self._queue_ready:
+            if not self._queue_ready.wait_for(
+                lambda: self.message_queue, timeout=timeout if timeout > 0 else None
+            ):
+                return None
+            return self.message_queue.popleft()
 
     def recv_all(self) -> List[dict]:
         """Get all queued messages"""
-        messages = []
-        while True:
-            try:
-                messages.append(self.message_queue.get_nowait())
-            except queue.Empty:
-                break
+        with self._queue_ready:
+            messages = list(self.message_queue)
+            self.message_queue.clear()
         return messages
 
     def _send(self, msg: dict):
         """Send raw message to hub"""
         if self.sock:
-            data = json.dumps(msg) + "\n"
-            self.sock.sendall(data.encode())
-
-    def _recv_one(self, timeout: float = 1.0) -> Optional[dict]:
-        """Receive single message with timeout"""
-        if not self.sock:
-            return None
-
-        ready, _, _ = select.select([self.sock], [], [], timeout)
-        if not ready:
-            return None
-
+            self.sock.sendall(_dumps_line(msg))
+
+    def _request(self, msg: dict, timeout: float = 5.0) -> Optional[dict]:
+        """Send a request and wait for the hub's reply to it.
+
+        The request is tagged with a req_id that the hub echoes back; the
+        receive thread hands the tagged reply to us so inbound messages stay
+        on message_queue in order. Returns None on timeout.
+        """
+        req_id = str(next(self._req_ids))
+        msg["req_id"] = req_id
+        reply_queue: queue.Queue = queue.Queue(maxsize=1)
+        self._pending[req_id] = reply_queue
         try:
-            data = self.sock.recv(65536)
-            if data:
-                line = data.decode().strip().split("\n")[0]
-                return json.loads(line)
-        except:
-            pass
-        return None
+            self._send(msg)
+            return reply_queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        finally:
+            self._pending.pop(req_id, None)
 
     def _start_recv_thread(self):
         """Start background receive thread"""
@@ -152,7 +179,7 @@ class HubClient:
 
     def _recv_loop(self):
         """Background loop to receive messages"""
-        buffer = ""
+        buffer = bytearray()
         while not self._stop_event.is_set():
             if not self.sock:
                 break
@@ -166,21 +193,38 @@ class HubClient:
                 if not data:
                     break
 
-                buffer += data.decode()
-                while "\n" in buffer:
-                    line, buffer = buffer.split("\n", 1)
+                # Only scan the newly received bytes for line ends
+                start = len(buffer)
+                buffer += data
+                while True:
+                    nl = buffer.find(b"\n", start)
+                    if nl < 0:
+                        break
+                    line = bytes(buffer[:nl])
+                    del buffer[:nl + 1]
+                    start = 0
                     if line:
                         try:
-                            msg = json.loads(line)
-                            self.message_queue.put(msg)
-                        except json.JSONDecodeError:
-                            pass
+                            msg = _loads(line)
+                        except ValueError:
+                            continue
+                        waiter = self._pending.get(msg.get("req_id"))
+                        if waiter is not None:
+                            waiter.put(msg)
+                        else:
+                            self._enqueue(msg)
 
             except (ConnectionResetError, BrokenPipeError):
                 break
             except Exception:
                 continue
 
+    def _enqueue(self, msg: dict):
+        """Queue an inbound message, dropping the oldest when full"""
+        with self._queue_ready:
+            self.message_queue.append(msg)
+            self._queue_ready.notify()
+
 
 def parse_mentions(text: str) -> tuple[str, List[str]]:
     """Parse @mentions from message text
@@ -192,15 +236,43 @@ def parse_mentions(text: str) -> tuple[str, List[str]]:
         "@claude-a @claude-b both do Y" -> ("both do Y", ["claude-a", "claude-b"])
         "everyone do Z" -> ("everyone do Z", [])
     """
+    # Most messages have no mentions; skip the regex engine entirely
+    if "@" not in text:
+        return text.strip(), []
+
     # Find all @mentions
-    mentions = re.findall(r'@([\w-]+)', text)
+    mentions = _MENTION_RE.findall(text)
 
     # Remove mentions from text
-    cleaned = re.sub(r'@[\w-]+\s*', '', text).strip()
+    cleaned = _MENTION_STRIP_RE.sub('', text).strip()
 
     return cleaned, mentions
 
 
+def send_datagram(session_id: str, body: str, to: List[str] = None,
+                  socket_path: Path = DEFAULT_SOCKET) -> Optional[dict]:
+    """Fire-and-forget send via the hub's datagram socket
+
+    Skips connect/REGISTER entirely, so one-shot CLI sends cost a single
+    sendto(). Returns None if the datagram socket isn't available, in which
+    case callers fall back to a full HubClient connection.
+    """
+    dgram_path = socket_path.with_suffix(".dgram")
+    msg = {"type": "MSG", "from": session_id, "body": body}
+    if to:
+        msg["to"] = to
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    try:
+        sock.sendto(_dumps(msg), str(dgram_path))
+    except OSError:
+        return None
+    finally:
+        sock.close()
+
+    return {"sent": True, "id": "unconfirmed", "to": to or "broadcast"}
+
+
 # Global client instance for CLI
 _client: Optional[HubClient] = None
 
@@ -235,6 +307,41 @@ def get_client(session_id: str = None) -> HubClient:
     return _client
 
 
+def send_message(message: str, socket_path: Path = DEFAULT_SOCKET) -> dict:
+    """Send a message with optional @mentions as this session"""
+    # Parse @mentions
+    body, mentions = parse_mentions(message)
+
+    client = get_client()
+    client.socket_path = socket_path
+
+    # One-shot send: no connection or registration needed
+    result = send_datagram(client.session_id, body, mentions or None, socket_path)
+    if result is not None:
+        return result
+
+    if not client.connected:
+        result = client.connect()
+        if "error" in result:
+            return result
+
+    return client.send(body, to=mentions if mentions else None)
+
+
+def recv_message(timeout: float = 5.0, socket_path: Path = DEFAULT_SOCKET) -> dict:
+    """Wait up to timeout seconds for one message to this session"""
+    client = get_client()
+    client.socket_path = socket_path
+
+    if not client.connected:
+        result = client.connect()
+        if "error" in result:
+            return result
+
+    msg = client.recv(timeout=timeout)
+    return msg if msg else {"messages": [], "count": 0}
+
+
 def main():
     if len(sys.argv) < 2:
         print("Usage: client.py <connect|send|recv|status> [args]")
@@ -264,22 +371,10 @@ def main():
             sys.exit(1)
 
         # Join all args as message
-        message = " ".join(args)
-
-        # Parse @mentions
-        body, mentions = parse_mentions(message)
-
-        client = get_client()
-        client.socket_path = socket_path
-
-        if not client.connected:
-            result = client.connect()
-            if "error" in result:
-                print(json.dumps(result))
-                sys.exit(1)
-
-        result = client.send(body, to=mentions if mentions else None)
+        result = send_message(" ".join(args), socket_path)
         print(json.dumps(result))
+        if "error" in result:
+            sys.exit(1)
 
     elif cmd == "recv":
         timeout = 5.0
@@ -288,20 +383,10 @@ def main():
             if idx + 1 < len(args):
                 timeout = float(args[idx + 1])
 
-        client = get_client()
-        client.socket_path = socket_path
-
-        if not client.connected:
-            result = client.connect()
-            if "error" in result:
-                print(json.dumps(result))
-                sys.exit(1)
-
-        msg = client.recv(timeout=timeout)
-        if msg:
-            print(json.dumps(msg))
-        else:
-            print(json.dumps({"messages": [], "count": 0}))
+        result = recv_message(timeout, socket_path)
+        print(json.dumps(result))
+        if "error" in result:
+            sys.exit(1)
 
     elif cmd == "status":
         client = get_client()
@@ -310,7 +395,7 @@ def main():
             "session_id": client.session_id,
             "connected": client.connected,
             "socket": str(client.socket_path),
-            "queued_messages": client.message_queue.qsize()
+            "queued_messages": len(client.message_queue)
         }))
 
     else:
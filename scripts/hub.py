@@ -10,29 +10,78 @@ Usage:
 
 import json
 import os
-import select
+import selectors
 import signal
 import socket
 import sys
 import threading
+import time
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Dict, List, Optional, Set
 
+try:
+    import orjson
+
+    _loads = orjson.loads
+
+    def _dumps(msg: dict) -> bytes:
+        return orjson.dumps(msg)
+
+    def _dumps_line(msg: dict) -> bytes:
+        # Newline written by the encoder: no bytes concat per frame
+        return orjson.dumps(msg, option=orjson.OPT_APPEND_NEWLINE)
+
+except ImportError:
+    _loads = json.loads
+
+    def _dumps(msg: dict) -> bytes:
+        return json.dumps(msg, separators=(",", ":"), ensure_ascii=False).encode()
+
+    def _dumps_line(msg: dict) -> bytes:
+        return (json.dumps(msg, separators=(",", ":"), ensure_ascii=False) + "\n").encode()
+
+
 # Default socket path
 DEFAULT_SOCKET = Path("/tmp/nclaude/hub.sock")
 
+# Clients that let this much unsent output pile up are dropped
+MAX_OUT_BUFFER = 8 * 1024 * 1024
+
+# SENT confirmations only differ in id/to/req_id: fill a byte template
+# instead of building and encoding a dict for every routed message
+SENT_TEMPLATE = b'{"type":"SENT","id":%b,"to":%b}\n'
+SENT_REQ_TEMPLATE = b'{"type":"SENT","id":%b,"to":%b,"req_id":%b}\n'
+SENT_TO_BROADCAST = b'"broadcast"'
+
+# Largest one-shot send accepted on the datagram socket
+MAX_DATAGRAM = 256 * 1024
+
+
+def dgram_path_for(socket_path: Path) -> Path:
+    """Path of the hub's fire-and-forget datagram socket"""
+    return socket_path.with_suffix(".dgram")
+
 
 class MessageHub:
     """Central message routing hub for nclaude"""
 
     def __init__(self, socket_path: Path = DEFAULT_SOCKET):
         self.socket_path = socket_path
+        self.dgram_path = dgram_path_for(socket_path)
         self.server: Optional[socket.socket] = None
+        self.dgram: Optional[socket.socket] = None
         self.clients: Dict[str, socket.socket] = {}  # session_id -> socket
         self.client_sessions: Dict[socket.socket, str] = {}  # socket -> session_id
+        self.recv_buffers: Dict[socket.socket, bytearray] = {}  # partial lines per client
+        self.out_buffers: Dict[socket.socket, bytearray] = {}  # unsent output per client
         self.running = False
         self.lock = threading.Lock()
+        # epoll/kqueue where available: no per-wakeup fd list, no 1024-fd cap
+        self.selector = selectors.DefaultSelector()
+        # Formatted timestamp for the current second (see _timestamp)
+        self._ts_second = -1
+        self._ts_text = ""
 
     def start(self):
         """Start the hub server"""
@@ -49,6 +98,15 @@ class MessageHub:
         self.server.bind(str(self.socket_path))
         self.server.listen(50)  # Support many concurrent connections
         self.server.setblocking(False)
+        self.selector.register(self.server, selectors.EVENT_READ)
+
+        # Datagram socket for one-shot sends: no connect/REGISTER round trip
+        if self.dgram_path.exists():
+            self.dgram_path.unlink()
+        self.dgram = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.dgram.bind(str(self.dgram_path))
+        self.dgram.setblocking(False)
+        self.selector.register(self.dgram, selectors.EVENT_READ)
 
         self.running = True
         print(json.dumps({
@@ -65,21 +123,25 @@ class MessageHub:
         self._event_loop()
 
     def _event_loop(self):
-        """Main event loop using select"""
+        """Main event loop using the selector"""
         while self.running:
-            # Build list of sockets to monitor
-            read_sockets = [self.server] + list(self.client_sessions.keys())
-
             try:
-                readable, _, _ = select.select(read_sockets, [], [], 1.0)
+                events = self.selector.select(timeout=1.0)
             except (ValueError, OSError):
-                # Socket closed, rebuild list
+                # Selector closed by stop()
                 continue
 
-            for sock in readable:
+            for key, mask in events:
+                sock = key.fileobj
                 if sock is self.server:
                     self._accept_client()
-                else:
+                    continue
+                if sock is self.dgram:
+                    self._handle_datagrams()
+                    continue
+                if mask & selectors.EVENT_WRITE:
+                    self._flush_client(sock)
+                if mask & selectors.EVENT_READ and sock in self.client_sessions:
                     self._handle_client(sock)
 
     def _accept_client(self):
@@ -90,6 +152,7 @@ class MessageHub:
             # Client must register with session_id in first message
             with self.lock:
                 self.client_sessions[client] = None  # Unregistered
+            self.selector.register(client, selectors.EVENT_READ)
         except Exception as e:
             print(json.dumps({"error": f"Accept failed: {e}"}), file=sys.stderr)
 
@@ -101,15 +164,27 @@ class MessageHub:
                 self._disconnect_client(client)
                 return
 
-            # Parse message(s) - may receive multiple newline-delimited JSON
-            for line in data.decode().strip().split("\n"):
-                if not line:
+            # Parse message(s) - may receive multiple newline-delimited JSON,
+            # possibly split across recv() calls. Only the newly received
+            # bytes are scanned for newlines.
+            buf = self.recv_buffers.setdefault(client, bytearray())
+            start = len(buf)
+            buf += data
+            while True:
+                nl = buf.find(b"\n", start)
+                if nl < 0:
+                    break
+                line = bytes(buf[:nl])
+                del buf[:nl + 1]
+                start = 0
+                if not line.strip():
                     continue
                 try:
-                    msg = json.loads(line)
-                    self._process_message(client, msg)
-                except json.JSONDecodeError:
+                    msg = _loads(line)
+                except ValueError:
                     self._send_error(client, "Invalid JSON")
+                    continue
+                self._process_message(client, msg)
 
         except (ConnectionResetError, BrokenPipeError):
             self._disconnect_client(client)
@@ -123,21 +198,34 @@ class MessageHub:
         # Handle registration
         if msg_type == "REGISTER":
             session_id = msg.get("session_id")
+            req_id = msg.get("req_id")
             if session_id:
+                # Only dict updates under the lock; socket I/O happens after
                 with self.lock:
-                    # Remove old registration if exists
                     old_sock = self.clients.get(session_id)
-                    if old_sock and old_sock != client:
-                        self._disconnect_client(old_sock)
+                    if old_sock is client:
+                        old_sock = None
+                    elif old_sock:
+                        # Detach the stale socket so closing it below doesn't
+                        # drop the new registration or announce a LEAVE
+                        self.client_sessions[old_sock] = None
 
                     self.clients[session_id] = client
                     self.client_sessions[client] = session_id
+                    online = list(self.clients.keys())
 
-                self._send_to_client(client, {
+                # Remove old registration if exists
+                if old_sock:
+                    self._disconnect_client(old_sock)
+
+                reply = {
                     "type": "REGISTERED",
                     "session_id": session_id,
-                    "online": list(self.clients.keys())
-                })
+                    "online": online
+                }
+                if req_id is not None:
+                    reply["req_id"] = req_id
+                self._send_to_client(client, reply)
                 self._broadcast({
                     "type": "JOIN",
                     "session_id": session_id,
@@ -151,6 +239,22 @@ class MessageHub:
             self._send_error(client, "Not registered. Send REGISTER first.")
             return
 
+        # Correlation tag for the SENT reply; not forwarded to recipients
+        req_id = msg.pop("req_id", None)
+
+        recipients = self._route_message(sender, msg, exclude={client})
+
+        # Confirm to sender. id and session names come from clients, so
+        # the variable fields still go through the encoder for escaping.
+        msg_id = _dumps(msg["id"])
+        to = _dumps(recipients) if recipients else SENT_TO_BROADCAST
+        if req_id is None:
+            self._send_bytes(client, SENT_TEMPLATE % (msg_id, to))
+        else:
+            self._send_bytes(client, SENT_REQ_TEMPLATE % (msg_id, to, _dumps(req_id)))
+
+    def _route_message(self, sender: str, msg: dict, exclude: Set[socket.socket]) -> List[str]:
+        """Stamp a message from `sender` and deliver it; returns the recipients"""
         # Add metadata
         msg["from"] = sender
         msg["timestamp"] = self._timestamp()
@@ -163,26 +267,66 @@ class MessageHub:
 
         if not recipients:
             # Broadcast to all
-            self._broadcast(msg, exclude={client})
+            self._broadcast(msg, exclude=exclude)
         else:
-            # Route to specific recipients
+            # Route to specific recipients, serializing once for all of them
+            data = _dumps_line(msg)
             for recipient in recipients:
-                self._route_to(recipient, msg)
+                self._route_to(recipient, msg, data)
 
-        # Confirm to sender
-        self._send_to_client(client, {
-            "type": "SENT",
-            "id": msg["id"],
-            "to": recipients or "broadcast"
-        })
+        return recipients
 
-    def _route_to(self, session_id: str, msg: dict):
-        """Route message to specific session"""
+    def _handle_datagrams(self):
+        """Route one-shot sends from the datagram socket.
+
+        Each datagram is one JSON message carrying its sender in "from";
+        there is no reply, so senders get fire-and-forget semantics.
+        """
+        while True:
+            try:
+                data = self.dgram.recv(MAX_DATAGRAM)
+            except BlockingIOError:
+                return
+            except OSError:
+                return  # Closed by stop()
+
+            try:
+                msg = _loads(data)
+            except ValueError:
+                continue
+            if not isinstance(msg, dict):
+                continue
+
+            # Datagrams are unauthenticated; drop anything that isn't shaped
+            # like a send rather than let it reach the routing code
+            sender = msg.pop("from", None)
+            if not sender or not isinstance(sender, str):
+                continue
+            to = msg.get("to")
+            if to is not None and not isinstance(to, str) and not (
+                isinstance(to, list) and all(isinstance(r, str) for r in to)
+            ):
+                continue
+
+            # Correlation tags belong to stream clients; a datagram must not
+            # be able to answer someone else's pending request
+            msg.pop("req_id", None)
+
+            try:
+                # Like a stream send, a broadcast skips the sender's own connection
+                with self.lock:
+                    own = self.clients.get(sender)
+                self._route_message(sender, msg, exclude={own} if own else set())
+            except Exception as e:
+                print(json.dumps({"error": f"Datagram failed: {e}"}), file=sys.stderr)
+
+    def _route_to(self, session_id: str, msg: dict, data: bytes):
+        """Route a pre-serialized message to specific session"""
         with self.lock:
             client = self.clients.get(session_id)
 
         if client:
-            self._send_to_client(client, msg)
+            self._send_bytes(client, data)
         else:
             # Queue for offline delivery? For now, just note it
             print(json.dumps({
@@ -196,16 +340,66 @@ class MessageHub:
         with self.lock:
             targets = [c for c in self.client_sessions.keys() if c not in exclude]
 
+        # Serialize once, send the same bytes to every target
+        data = _dumps_line(msg)
         for client in targets:
-            self._send_to_client(client, msg)
+            self._send_bytes(client, data)
 
     def _send_to_client(self, client: socket.socket, msg: dict):
         """Send message to client"""
+        self._send_bytes(client, _dumps_line(msg))
+
+    def _send_bytes(self, client: socket.socket, data: bytes):
+        """Send an already-framed message to client.
+
+        Client sockets are non-blocking: whatever the kernel doesn't take
+        now is buffered and flushed when the selector reports the socket
+        writable, so a slow reader never stalls the loop.
+        """
+        buf = self.out_buffers.get(client)
+        if buf is not None:
+            # Already backlogged; append to preserve ordering
+            buf += data
+            if len(buf) > MAX_OUT_BUFFER:
+                self._disconnect_client(client)
+            return
+
         try:
-            data = json.dumps(msg) + "\n"
-            client.sendall(data.encode())
-        except (BrokenPipeError, ConnectionResetError):
+            sent = client.send(data)
+        except BlockingIOError:
+            sent = 0
+        except OSError:
             self._disconnect_client(client)
+            return
+
+        if sent < len(data):
+            self.out_buffers[client] = bytearray(data[sent:])
+            self._set_events(client, selectors.EVENT_READ | selectors.EVENT_WRITE)
+
+    def _flush_client(self, client: socket.socket):
+        """Send as much buffered output as the socket will take"""
+        buf = self.out_buffers.get(client)
+        if not buf:
+            return
+
+        try:
+            sent = client.send(buf)
+        except BlockingIOError:
+            return
+        except OSError:
+            self._disconnect_client(client)
+            return
+
+        del buf[:sent]
+        if not buf:
+            del self.out_buffers[client]
+            self._set_events(client, selectors.EVENT_READ)
+
+    def _set_events(self, client: socket.socket, events: int):
+        try:
+            self.selector.modify(client, events)
+        except (KeyError, ValueError):
+            pass  # Not registered (disconnected)
 
     def _send_error(self, client: socket.socket, error: str):
         """Send error to client"""
@@ -215,9 +409,16 @@ class MessageHub:
         """Clean up disconnected client"""
         with self.lock:
             session_id = self.client_sessions.pop(client, None)
+            self.recv_buffers.pop(client, None)
+            self.out_buffers.pop(client, None)
             if session_id:
                 self.clients.pop(session_id, None)
 
+        try:
+            self.selector.unregister(client)
+        except (KeyError, ValueError):
+            pass  # Already unregistered
+
         try:
             client.close()
         except:
@@ -231,15 +432,25 @@ class MessageHub:
             })
 
     def _timestamp(self) -> str:
-        return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+        # Second resolution, so a burst of messages shares one formatted
+        # string instead of formatting a datetime per message
+        now = int(time.time())
+        if now != self._ts_second:
+            self._ts_second = now
+            self._ts_text = datetime.fromtimestamp(now, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+        return self._ts_text
 
     def stop(self):
         """Stop the hub server"""
         self.running = False
         if self.server:
             self.server.close()
+        if self.dgram:
+            self.dgram.close()
         if self.socket_path.exists():
             self.socket_path.unlink()
+        if self.dgram_path.exists():
+            self.dgram_path.unlink()
         pid_file = self.socket_path.with_suffix(".pid")
         if pid_file.exists():
             pid_file.unlink()
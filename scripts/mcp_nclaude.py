@@ -29,6 +29,7 @@ TOOLS PROVIDED:
     - hub_*: Real-time hub commands (connect, send, recv)
 """
 
+import importlib.util
 import json
 import os
 import subprocess
@@ -52,9 +53,38 @@ mcp = FastMCP("nclaude")
 # Get nclaude script path (sibling to this file)
 NCLAUDE_SCRIPT = Path(__file__).parent / "nclaude.py"
 
+# nclaude runs in-process by default; NCLAUDE_MCP_SUBPROCESS=1 restores the
+# old one-process-per-call behaviour
+USE_SUBPROCESS = os.environ.get("NCLAUDE_MCP_SUBPROCESS") == "1"
+
+
+def _load_nclaude():
+    """Import nclaude.py as a private module, once per process
+
+    A private name keeps the script from shadowing the installed nclaude
+    package, and nothing is imported in subprocess mode.
+    """
+    module = sys.modules.get("_nclaude_script")
+    if module is None:
+        spec = importlib.util.spec_from_file_location("_nclaude_script", NCLAUDE_SCRIPT)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules["_nclaude_script"] = module
+        try:
+            spec.loader.exec_module(module)
+        except BaseException:
+            del sys.modules["_nclaude_script"]
+            raise
+    return module
+
 
 def _run_nclaude(*args) -> dict:
-    """Run nclaude.py command and return result"""
+    """Run nclaude command and return result"""
+    if not USE_SUBPROCESS:
+        try:
+            return _load_nclaude().cli_main(list(args))
+        except Exception as e:
+            return {"error": str(e)}
+
     cmd = ["python3", str(NCLAUDE_SCRIPT)] + list(args)
 
     # Pass through environment
@@ -293,14 +323,12 @@ def get_full_status() -> str:
 
     Returns session info and chat status.
     """
-    whoami_result = _run_nclaude("whoami")
-    status_result = _run_nclaude("status")
-    hub_result = _run_nclaude("hub", "status")
+    result = _run_nclaude("multi", "whoami", "status", "hub.status")
 
     return json.dumps({
-        "whoami": whoami_result,
-        "status": status_result,
-        "hub": hub_result
+        "whoami": result.get("whoami"),
+        "status": result.get("status"),
+        "hub": result.get("hub.status")
     }, indent=2)
 
 
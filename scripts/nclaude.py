@@ -4,31 +4,121 @@
 A simple file-based message queue for communication between Claude Code sessions.
 No sockets, no pipes, no bullshit.
 """
+import copy
 import fcntl
+import functools
+import importlib.util
 import json
+import mmap
 import os
+import re
+import select
 import shutil
 import signal
 import subprocess
 import sys
 import time
-from datetime import datetime, timezone
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 def get_git_info():
     """Get git repo info for smart defaults"""
+    return _git_info(os.getcwd())
+
+
+# Env vars that change how git finds the repo; the filesystem walk ignores them
+GIT_DISCOVERY_ENV = ("GIT_DIR", "GIT_WORK_TREE", "GIT_COMMON_DIR", "GIT_CEILING_DIRECTORIES")
+
+
+def _git_info_from_fs(cwd):
+    """Read repo info straight from .git, without running git.
+
+    Handles plain repos, worktrees and submodules (.git file with a gitdir:
+    line). Returns None for anything unusual (bare repos, GIT_DIR & co.,
+    repos owned by another user, refs outside refs/heads) so the caller can
+    ask git instead.
+    """
+    if any(var in os.environ for var in GIT_DISCOVERY_ENV):
+        return None
+
+    start = Path(cwd).resolve()
+    for top in (start, *start.parents):
+        dotgit = top / ".git"
+        if dotgit.is_dir():
+            git_dir = common_dir = dotgit
+            break
+        if dotgit.is_file():
+            # Worktree or submodule: "gitdir: <path>", relative to top
+            text = dotgit.read_text()
+            if not text.startswith("gitdir: "):
+                return None
+            git_dir = (top / text[8:].strip()).resolve()
+            try:
+                # Worktrees point back at the main repo's .git via commondir
+                common_dir = (git_dir / (git_dir / "commondir").read_text().strip()).resolve()
+            except FileNotFoundError:
+                common_dir = git_dir
+            break
+        if top.name == ".git" and (top / "HEAD").is_file():
+            # Inside the .git dir itself
+            git_dir = common_dir = top
+            top = top.parent
+            break
+    else:
+        return None
+
+    # git refuses repos owned by someone else (safe.directory)
+    if top.stat().st_uid != os.geteuid():
+        return None
+
+    head = (git_dir / "HEAD").read_text().strip()
+    if head.startswith("ref: refs/heads/"):
+        branch_name = head[16:]
+    elif head.startswith("ref: "):
+        return None
+    else:
+        branch_name = ""  # detached, like git branch --show-current
+
+    repo_name = common_dir.parent.name if common_dir.name == ".git" else top.name
+    return common_dir.resolve(), repo_name, branch_name
+
+
+@functools.lru_cache(maxsize=8)
+def _git_info(cwd):
+    """git lookups for get_git_info, cached per working directory.
+
+    BASE and the auto session ID both need this within one command. The
+    cache only lives that long: cli_main clears it before each call, since
+    a branch switch between calls must show up. Most checkouts are answered
+    from .git directly; git itself is the fallback.
+    """
     try:
-        # Get git common dir (works for worktrees too)
-        # For worktrees, this points to main repo's .git dir
-        git_common = subprocess.run(
-            ["git", "rev-parse", "--git-common-dir"],
-            capture_output=True, text=True, timeout=5
+        info = _git_info_from_fs(cwd)
+    except (OSError, UnicodeDecodeError):
+        info = None
+    if info is not None:
+        return info
+
+    try:
+        # One git call for all three values. rev-parse stops at the first
+        # argument it can't answer (e.g. --show-toplevel inside .git, or HEAD
+        # on an unborn branch) but still prints everything before it.
+        result = subprocess.run(
+            ["git", "rev-parse", "--git-common-dir", "--show-toplevel", "--abbrev-ref", "HEAD"],
+            capture_output=True, text=True, timeout=5, cwd=cwd
         )
-        if git_common.returncode != 0:
+        lines = result.stdout.splitlines()
+        if not lines:
             return None, None, None
 
-        common_dir = Path(git_common.stdout.strip()).resolve()
+        # Get git common dir (works for worktrees too)
+        # For worktrees, this points to main repo's .git dir
+        common_dir = (Path(cwd) / lines[0]).resolve()
 
         # Derive repo name from common_dir (works for both regular repos and worktrees)
         # common_dir is either:
@@ -38,18 +128,18 @@ def get_git_info():
             repo_name = common_dir.parent.name
         else:
             # Fallback to show-toplevel if common_dir structure is unexpected
-            repo_root = subprocess.run(
-                ["git", "rev-parse", "--show-toplevel"],
-                capture_output=True, text=True, timeout=5
-            )
-            repo_name = Path(repo_root.stdout.strip()).name if repo_root.returncode == 0 else "unknown"
+            repo_name = Path(lines[1]).name if len(lines) > 1 else "unknown"
 
-        # Get current branch
-        branch = subprocess.run(
-            ["git", "branch", "--show-current"],
-            capture_output=True, text=True, timeout=5
-        )
-        branch_name = branch.stdout.strip() if branch.returncode == 0 else "detached"
+        # Get current branch; --abbrev-ref says "HEAD" when detached or unborn,
+        # so only then ask git branch (which knows an unborn branch's name)
+        if len(lines) > 2 and lines[2] != "HEAD":
+            branch_name = lines[2]
+        else:
+            branch = subprocess.run(
+                ["git", "branch", "--show-current"],
+                capture_output=True, text=True, timeout=5, cwd=cwd
+            )
+            branch_name = branch.stdout.strip() if branch.returncode == 0 else "detached"
 
         return common_dir, repo_name, branch_name
     except Exception:
@@ -93,9 +183,32 @@ LOCK = BASE / ".lock"
 SESSIONS = BASE / "sessions"
 PENDING = BASE / "pending"
 
+# Logs at least this big are mmap'd rather than read into memory
+MMAP_MIN_BYTES = 1 << 20
+
+# A single O_APPEND write up to this size lands whole; only longer messages
+# take the lock
+ATOMIC_APPEND_MAX = 4096
+
 # Global peers file (shared across all projects)
 PEERS_FILE = Path("/tmp/nclaude/.peers")
 
+# Last parsed peers file, keyed on its (mtime, size)
+_peers_cache = (None, {})
+
+# Flags that take a value (the next argument), by the name they're stored under
+VALUE_FLAGS = {
+    "--dir": "dir",
+    "-d": "dir",
+    "--type": "type",
+    "--timeout": "timeout",
+    "--interval": "interval",
+    "--history": "history",
+}
+
+# Commands that drive the terminal themselves instead of returning a result
+INTERACTIVE_COMMANDS = ("listen", "watch", "chat")
+
 
 def set_base_dir(path):
     """Override base directory (for cross-project messaging)"""
@@ -112,20 +225,39 @@ def get_current_project():
     return BASE.name
 
 
+def _peers_stamp():
+    st = PEERS_FILE.stat()
+    return st.st_mtime_ns, st.st_size
+
+
 def load_peers():
-    """Load peers from global peers file"""
-    if not PEERS_FILE.exists():
-        return {}
+    """Load peers from global peers file (re-parsed only when it changes)"""
+    global _peers_cache
     try:
-        return json.loads(PEERS_FILE.read_text())
+        stamp = _peers_stamp()
+        if stamp != _peers_cache[0]:
+            _peers_cache = (stamp, json.loads(PEERS_FILE.read_text()))
     except (json.JSONDecodeError, IOError):
         return {}
+    # Callers edit the result in place before saving it
+    return copy.deepcopy(_peers_cache[1])
 
 
 def save_peers(peers):
-    """Save peers to global peers file"""
+    """Save peers to global peers file (skipped if nothing changed)"""
+    global _peers_cache
+    try:
+        if peers == _peers_cache[1] and _peers_stamp() == _peers_cache[0]:
+            return
+    except FileNotFoundError:
+        pass
+
+    # Write a temp file and rename it over, so readers never see a partial file
     PEERS_FILE.parent.mkdir(parents=True, exist_ok=True)
-    PEERS_FILE.write_text(json.dumps(peers, indent=2))
+    tmp = PEERS_FILE.with_name(f"{PEERS_FILE.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(peers, separators=(",", ":")))
+    os.replace(tmp, PEERS_FILE)
+    _peers_cache = (_peers_stamp(), copy.deepcopy(peers))
 
 
 def pair(target_project):
@@ -191,14 +323,181 @@ def list_peers():
 
 def init():
     """Initialize workspace"""
+    # The lock file is created last, so if it exists the rest does too.
+    # Checked on disk rather than remembered: clear() may run in another process.
+    if LOCK.exists():
+        return {"status": "ok", "path": str(BASE)}
+
     SESSIONS.mkdir(parents=True, exist_ok=True)
     LOG.touch()
     LOCK.touch()
     return {"status": "ok", "path": str(BASE)}
 
 
+def _map_log():
+    """The log's contents as bytes, or a read-only mmap when it's large
+
+    Both support find(), rfind() and slicing, so only the pages actually
+    scanned get read. A missing or empty log gives b"".
+    """
+    try:
+        fd = os.open(LOG, os.O_RDONLY)
+    except FileNotFoundError:
+        return b""
+    try:
+        size = os.fstat(fd).st_size
+        if size >= MMAP_MIN_BYTES:
+            return mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+        return os.read(fd, size) if size else b""
+    finally:
+        os.close(fd)
+
+
+def _count_newlines(data, end=None):
+    """Count newlines in data[:end]; data is bytes or an mmap (which has no count())"""
+    if end is None:
+        end = len(data)
+    if isinstance(data, bytes):
+        return data.count(b"\n", 0, end)
+    return sum(
+        data[i:min(i + MMAP_MIN_BYTES, end)].count(b"\n")
+        for i in range(0, end, MMAP_MIN_BYTES)
+    )
+
+
+def _split_lines(chunk):
+    """Decode complete log lines; a trailing partial line is dropped"""
+    return chunk.decode("utf-8", "replace").split("\n")[:-1]
+
+
+def _skip_lines(data, n, pos=0):
+    """Byte offset of the line n lines after pos in data"""
+    for _ in range(n):
+        nl = data.find(b"\n", pos)
+        if nl < 0:
+            return len(data)
+        pos = nl + 1
+    return pos
+
+
+def _read_pointer(pointer_file):
+    """Get (byte_offset, line_count) a session has read up to
+
+    Pointers are stored as "offset:lines". Older ones hold only a line
+    count, so the log is scanned once to find the matching offset.
+    """
+    try:
+        content = pointer_file.read_text().strip()
+    except FileNotFoundError:
+        return 0, 0
+
+    try:
+        if ":" in content:
+            offset, count = map(int, content.split(":"))
+            return offset, count
+        count = int(content or "0")
+    except ValueError:
+        return 0, 0
+
+    offset = _skip_lines(_map_log(), count) if count else 0
+    return offset, count
+
+
+def _write_pointer(pointer_file, offset, count):
+    pointer_file.write_text(f"{offset}:{count}")
+
+
+def _write_all(fd, data):
+    """os.write() until all of data is out - a short write only appends part"""
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+
+def _log_stamp():
+    """(mtime, size) of the log, or None if missing - cheap change check for polling"""
+    try:
+        st = os.stat(LOG)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _log_tail(offset, count):
+    """Raw bytes of the complete lines appended to the log after a byte offset
+
+    Returns (data, offset, count) with offset/count saying where data starts;
+    they go back to 0 if the log is now shorter than offset (it was cleared).
+    """
+    try:
+        with open(LOG, "rb") as f:
+            if offset > os.fstat(f.fileno()).st_size:
+                offset, count = 0, 0
+            f.seek(offset)
+            data = f.read()
+    except FileNotFoundError:
+        return b"", 0, 0
+
+    return data[:data.rfind(b"\n") + 1], offset, count
+
+
+def _read_log_from(offset, count=0):
+    """Read complete lines appended to the log after a byte offset
+
+    Returns (lines, offset, count) advanced past those lines.
+    """
+    data, offset, count = _log_tail(offset, count)
+    lines = _split_lines(data)
+    return lines, offset + len(data), count + len(lines)
+
+
+# inotify(7) event bits for _watch_log_dir
+IN_MODIFY = 0x002
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+
+
+def _watch_log_dir():
+    """Get (wait, stop): wait(timeout) returns early when a file in BASE changes
+
+    Uses inotify through libc on Linux, so an idle listener blocks in the
+    kernel instead of waking up to poll. Elsewhere, or if inotify can't be
+    set up, wait is just time.sleep.
+    """
+    try:
+        import ctypes
+        import ctypes.util
+
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(fd, os.fsencode(BASE), IN_MODIFY | IN_CREATE | IN_MOVED_TO) < 0:
+            os.close(fd)
+            raise OSError(ctypes.get_errno(), "inotify_add_watch failed")
+    except (OSError, AttributeError):
+        return time.sleep, lambda: None
+
+    def wait(timeout):
+        if select.select([fd], [], [], timeout)[0]:
+            # Drain the queued events; the caller re-checks the log itself
+            try:
+                while os.read(fd, 4096):
+                    pass
+            except BlockingIOError:
+                pass
+
+    return wait, lambda: os.close(fd)
+
+
+def _count_log_from(offset, count=0):
+    """Like _read_log_from, but only counts the new lines (no decoding)"""
+    data, offset, count = _log_tail(offset, count)
+    return offset + len(data), count + data.count(b"\n")
+
+
 def send(session_id: str, message: str, msg_type: str = "MSG"):
-    """Send a message (atomic append with flock)
+    """Send a message (atomic O_APPEND write, flock only for long messages)
 
     Args:
         session_id: Session identifier
@@ -206,7 +505,7 @@ def send(session_id: str, message: str, msg_type: str = "MSG"):
         msg_type: Message type (MSG, TASK, REPLY, STATUS, ERROR, URGENT)
     """
     init()
-    ts = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+    ts = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime())
 
     # Check if message is multi-line
     if "\n" in message:
@@ -219,10 +518,22 @@ def send(session_id: str, message: str, msg_type: str = "MSG"):
         else:
             line = f"[{ts}] [{session_id}] {message}\n"
 
-    with open(LOCK, "r") as lock_fd:
-        fcntl.flock(lock_fd, fcntl.LOCK_EX)
-        with open(LOG, "a") as f:
-            f.write(line)
+    data = line.encode("utf-8")
+    fd = os.open(LOG, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        if len(data) <= ATOMIC_APPEND_MAX:
+            _write_all(fd, data)
+        else:
+            # write() can come back short (full disk, signal), leaving the
+            # rest of the line for another call. The lock keeps two long
+            # messages from interleaving their pieces with each other; short
+            # lines skip it to keep the common send lock-free, so a short
+            # line can still land between a long one's pieces in that case.
+            with open(LOCK, "r") as lock_fd:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX)
+                _write_all(fd, data)
+    finally:
+        os.close(fd)
     return {"sent": message, "session": session_id, "timestamp": ts, "type": msg_type}
 
 
@@ -238,12 +549,7 @@ def read(session_id: str, all_messages: bool = False, quiet: bool = False):
     pointer_file = SESSIONS / session_id
 
     # Get last read position
-    last_line = 0
-    if pointer_file.exists() and not all_messages:
-        try:
-            last_line = int(pointer_file.read_text().strip() or "0")
-        except ValueError:
-            last_line = 0
+    offset, last_line = (0, 0) if all_messages else _read_pointer(pointer_file)
 
     # Read log
     if not LOG.exists():
@@ -251,11 +557,11 @@ def read(session_id: str, all_messages: bool = False, quiet: bool = False):
             return None  # Signal no output needed
         return {"messages": [], "new_count": 0, "total": 0}
 
-    lines = LOG.read_text().splitlines()
-    new_lines = lines[last_line:]
+    # Only the bytes appended since the last read
+    new_lines, offset, total = _read_log_from(offset, last_line)
 
     # Update pointer
-    pointer_file.write_text(str(len(lines)))
+    _write_pointer(pointer_file, offset, total)
 
     # In quiet mode, only return if there are new messages
     if quiet and len(new_lines) == 0:
@@ -264,7 +570,7 @@ def read(session_id: str, all_messages: bool = False, quiet: bool = False):
     return {
         "messages": new_lines,
         "new_count": len(new_lines),
-        "total": len(lines)
+        "total": total
     }
 
 
@@ -284,15 +590,18 @@ def status():
             "log_path": str(LOG)
         }
 
-    lines = LOG.read_text().splitlines()
+    # Count newlines without decoding the log or building a list of lines
+    message_count = _count_newlines(_map_log())
     sessions = []
     if SESSIONS.exists():
-        sessions = [f.name for f in SESSIONS.iterdir() if f.is_file()]
+        # DirEntry.is_file() uses the type from the directory listing, no stat per entry
+        with os.scandir(SESSIONS) as entries:
+            sessions = [e.name for e in entries if e.is_file()]
 
     return {
         "active": True,
         "project": current,
-        "message_count": len(lines),
+        "message_count": message_count,
         "sessions": sessions,
         "peers": my_peers,
         "log_path": str(LOG)
@@ -309,9 +618,9 @@ def clear():
 def pending(session_id: str):
     """Check for pending messages (written by listen daemon)
 
-    The listen daemon writes line numbers to pending/<session_id> when new
-    messages arrive. This function reads those line numbers, fetches the
-    actual messages, and clears the pending file.
+    The listen daemon writes line numbers (and their byte offsets) to
+    pending/<session_id> when new messages arrive. This function reads that
+    range, fetches the actual messages, and clears the pending file.
     """
     pending_file = PENDING / session_id
 
@@ -325,8 +634,11 @@ def pending(session_id: str):
             pending_file.unlink()
             return {"pending": False, "messages": [], "count": 0}
 
-        # Format: "start_line:end_line" (0-indexed)
-        start, end = map(int, content.split(":"))
+        # Format: "start_line:end_line[:start_byte:end_byte]" (0-indexed)
+        fields = [int(f) for f in content.split(":")]
+        if len(fields) not in (2, 4):
+            raise ValueError(content)
+        start, end = fields[:2]
     except (ValueError, FileNotFoundError):
         return {"pending": False, "messages": [], "count": 0}
 
@@ -335,8 +647,18 @@ def pending(session_id: str):
         pending_file.unlink()
         return {"pending": False, "messages": [], "count": 0}
 
-    lines = LOG.read_text().splitlines()
-    pending_msgs = lines[start:end]
+    if len(fields) == 4:
+        # Read just the pending byte range
+        start_offset, end_offset = fields[2:]
+        with open(LOG, "rb") as f:
+            f.seek(start_offset)
+            pending_msgs = _split_lines(f.read(end_offset - start_offset))
+    else:
+        # Line numbers only (older listener): scan for their offsets
+        data = _map_log()
+        start_offset = _skip_lines(data, start)
+        end_offset = _skip_lines(data, end - start, start_offset)
+        pending_msgs = _split_lines(data[start_offset:end_offset])
 
     # Clear pending file
     pending_file.unlink()
@@ -344,7 +666,7 @@ def pending(session_id: str):
     # Update session pointer to current end
     pointer_file = SESSIONS / session_id
     pointer_file.parent.mkdir(parents=True, exist_ok=True)
-    pointer_file.write_text(str(end))
+    _write_pointer(pointer_file, end_offset, end)
 
     return {
         "pending": True,
@@ -359,7 +681,7 @@ def listen(session_id: str, interval: int = 5):
 
     Runs in foreground - use & or nohup for background.
     Writes line range to pending/<session_id> when new messages arrive.
-    Format: "start_line:end_line" (0-indexed, exclusive end)
+    Format: "start_line:end_line:start_byte:end_byte" (0-indexed, exclusive end)
     """
     init()
     PENDING.mkdir(parents=True, exist_ok=True)
@@ -382,25 +704,31 @@ def listen(session_id: str, interval: int = 5):
         "pending_file": str(pending_file)
     }), flush=True)
 
+    # Sleep until the log changes (interval is then just an upper bound)
+    wait, stop_waiting = _watch_log_dir()
+
+    # Running line count of the log, advanced by counting only appended bytes
+    offset = total_lines = 0
+    last_stamp = None
     while running:
         try:
+            # Nothing to do unless the log changed since the last tick
+            stamp = _log_stamp()
+            if stamp == last_stamp:
+                wait(interval)
+                continue
+            last_stamp = stamp
+
             # Get current pointer (last read position)
-            last_read = 0
-            if pointer_file.exists():
-                try:
-                    last_read = int(pointer_file.read_text().strip() or "0")
-                except ValueError:
-                    last_read = 0
+            read_offset, last_read = _read_pointer(pointer_file)
 
             # Get total line count
-            total_lines = 0
-            if LOG.exists():
-                total_lines = len(LOG.read_text().splitlines())
+            offset, total_lines = _count_log_from(offset, total_lines)
 
             # Check for new messages
             if total_lines > last_read:
                 # Write pending range
-                pending_file.write_text(f"{last_read}:{total_lines}")
+                pending_file.write_text(f"{last_read}:{total_lines}:{read_offset}:{offset}")
                 new_count = total_lines - last_read
 
                 print(json.dumps({
@@ -413,18 +741,53 @@ def listen(session_id: str, interval: int = 5):
                 # Terminal bell for human awareness
                 print("\a", end="", flush=True)
 
-            time.sleep(interval)
+            wait(interval)
         except Exception as e:
             print(json.dumps({"error": str(e)}), file=sys.stderr, flush=True)
             time.sleep(interval)
 
     # Cleanup
+    stop_waiting()
     if pending_file.exists():
         pending_file.unlink()
 
     print(json.dumps({"status": "stopped", "session": session_id}), flush=True)
 
 
+# watch() line colors by tag as (rank, color); the lowest-ranked tag on a line wins
+CYAN = b"\033[1;36m"  # Cyan bold
+RESET = b"\033[0m"
+RED, YELLOW, GREEN, MAGENTA = b"\033[1;31m", b"\033[1;33m", b"\033[1;32m", b"\033[1;35m"
+WATCH_TAG_COLORS = {
+    b"URGENT": (0, RED),
+    b"ERROR": (0, RED),
+    b"BROADCAST": (1, YELLOW),
+    b"HUMAN": (1, YELLOW),
+    b"STATUS": (2, GREEN),
+    b"TASK": (3, MAGENTA),
+    b"REPLY": (3, MAGENTA),
+}
+# One scan of the line finds every tag
+WATCH_TAG_RE = re.compile(rb"\[(" + b"|".join(WATCH_TAG_COLORS) + rb")\]")
+
+
+def _format_watch_line(line: bytes) -> bytes:
+    """Colorize one raw log line for watch()"""
+    if line.startswith(b"<<<["):
+        # Multi-line message header
+        return b"\n" + CYAN + line + RESET
+    if line == b"<<<END>>>":
+        return CYAN + line + RESET
+    if line.startswith(b"["):
+        # Single-line message - colorize by tag
+        tags = WATCH_TAG_RE.findall(line)
+        if tags:
+            return min(WATCH_TAG_COLORS[tag] for tag in tags)[1] + line + RESET
+        return line
+    # Message body content
+    return b"  " + line
+
+
 def watch(timeout: int = 60, interval: float = 1.0, history: int = 0):
     """Watch messages live (like tail -f but formatted)
 
@@ -444,17 +807,17 @@ def watch(timeout: int = 60, interval: float = 1.0, history: int = 0):
     signal.signal(signal.SIGINT, handle_signal)
     signal.signal(signal.SIGTERM, handle_signal)
 
-    # Get current line count to start from
-    last_line = 0
+    # Get current position to start from
+    offset = last_line = 0
     if LOG.exists():
-        lines = LOG.read_text().splitlines()
-        total_lines = len(lines)
-        if history > 0 and total_lines > 0:
-            # Show last N lines as history
-            start_from = max(0, total_lines - history)
-            last_line = start_from
-        else:
-            last_line = total_lines
+        data = _map_log()
+        offset = data.rfind(b"\n") + 1
+        # Show last N lines as history
+        for _ in range(history):
+            if offset == 0:
+                break
+            offset = data.rfind(b"\n", 0, offset - 1) + 1
+        last_line = _count_newlines(data, offset)
 
     project = get_current_project()
     session_id = get_auto_session_id()
@@ -466,6 +829,7 @@ def watch(timeout: int = 60, interval: float = 1.0, history: int = 0):
     print(f"{'='*60}\n")
 
     start_time = time.time()
+    last_stamp = None
 
     while running:
         try:
@@ -474,38 +838,22 @@ def watch(timeout: int = 60, interval: float = 1.0, history: int = 0):
                 print(f"\n[timeout reached after {timeout}s]")
                 break
 
-            # Read new lines
-            if LOG.exists():
-                lines = LOG.read_text().splitlines()
-                new_lines = lines[last_line:]
+            # Read new lines (skipped while the log is unchanged)
+            stamp = _log_stamp()
+            if stamp and stamp != last_stamp:
+                last_stamp = stamp
+                # Raw bytes: lines are colorized without decoding them
+                data, offset, last_line = _log_tail(offset, last_line)
+                new_lines = data.split(b"\n")[:-1]
+                offset += len(data)
+                last_line += len(new_lines)
 
                 if new_lines:
-                    for line in new_lines:
-                        # Format the output nicely
-                        if line.startswith("<<<["):
-                            # Multi-line message header
-                            print(f"\n\033[1;36m{line}\033[0m")  # Cyan bold
-                        elif line == "<<<END>>>":
-                            print(f"\033[1;36m{line}\033[0m")  # Cyan bold
-                        elif line.startswith("["):
-                            # Single-line message - parse and colorize
-                            if "[URGENT]" in line or "[ERROR]" in line:
-                                print(f"\033[1;31m{line}\033[0m")  # Red bold
-                            elif "[BROADCAST]" in line or "[HUMAN]" in line:
-                                print(f"\033[1;33m{line}\033[0m")  # Yellow bold
-                            elif "[STATUS]" in line:
-                                print(f"\033[1;32m{line}\033[0m")  # Green bold
-                            elif "[TASK]" in line or "[REPLY]" in line:
-                                print(f"\033[1;35m{line}\033[0m")  # Magenta bold
-                            else:
-                                print(line)
-                        else:
-                            # Message body content
-                            print(f"  {line}")
-
-                    last_line = len(lines)
-                    # Terminal bell on new messages
-                    print("\a", end="", flush=True)
+                    # The whole batch plus the terminal bell in one write
+                    out = b"\n".join(map(_format_watch_line, new_lines)) + b"\n\a"
+                    sys.stdout.flush()
+                    sys.stdout.buffer.write(out)
+                    sys.stdout.buffer.flush()
 
             time.sleep(interval)
         except Exception as e:
@@ -516,6 +864,18 @@ def watch(timeout: int = 60, interval: float = 1.0, history: int = 0):
     return {"status": "stopped", "lines_seen": last_line}
 
 
+def _load_script(name):
+    """Import a sibling script (hub.py, client.py) as a module, once per process"""
+    module_name = f"_nclaude_{name}"
+    module = sys.modules.get(module_name)
+    if module is None:
+        spec = importlib.util.spec_from_file_location(module_name, Path(__file__).parent / f"{name}.py")
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[module_name] = module
+        spec.loader.exec_module(module)
+    return module
+
+
 def show_help():
     """Human-friendly help output"""
     help_text = """
@@ -540,6 +900,7 @@ COMMANDS:
   pair <project>    Register peer for coordination
   unpair [project]  Remove peer (or all peers)
   peers             List current peers
+  multi <cmd>...    Run several commands at once (e.g. multi whoami hub.status)
 
 FLAGS:
   --dir, -d NAME    Target different project (name or path)
@@ -582,61 +943,56 @@ LOG LOCATION:
     print(help_text)
 
 
-def main():
-    if len(sys.argv) < 2 or sys.argv[1] in ("-h", "--help", "help"):
-        show_help()
-        sys.exit(0)
-
-    cmd = sys.argv[1]
-    args = sys.argv[2:]
-
-    # Parse --dir flag first (for cross-project messaging)
-    for i, arg in enumerate(args):
-        if arg in ("--dir", "-d") and i + 1 < len(args):
-            target_dir = args[i + 1]
-            # Resolve relative to /tmp/nclaude/ if just a name, otherwise use as path
-            if "/" not in target_dir:
-                set_base_dir(f"/tmp/nclaude/{target_dir}")
-            else:
-                # It's a path - get the git repo name from it
-                try:
-                    result = subprocess.run(
-                        ["git", "-C", target_dir, "rev-parse", "--show-toplevel"],
-                        capture_output=True, text=True, timeout=5
-                    )
-                    if result.returncode == 0:
-                        repo_name = Path(result.stdout.strip()).name
-                        set_base_dir(f"/tmp/nclaude/{repo_name}")
-                    else:
-                        # Not a git repo, use directory name
-                        set_base_dir(f"/tmp/nclaude/{Path(target_dir).name}")
-                except Exception:
-                    set_base_dir(f"/tmp/nclaude/{Path(target_dir).name}")
-            break
+def _opt(opts, name, cast, default):
+    """Typed value of a value flag, or default if it's missing or malformed"""
+    try:
+        return cast(opts[name])
+    except (KeyError, ValueError):
+        return default
 
-    # Parse flags
-    quiet = "--quiet" in args or "-q" in args
-    all_msgs = "--all" in args
-
-    # Parse --type flag for send command
-    msg_type = "MSG"
-    for i, arg in enumerate(args):
-        if arg == "--type" and i + 1 < len(args):
-            msg_type = args[i + 1].upper()
-            break
 
-    # Get non-flag args (exclude flag values)
-    skip_next = False
+def run_command(cmd, args):
+    """Run one command and return its result (None if it printed its own output)"""
+    # One pass over args: value flags go in opts (and take their value with
+    # them), other flags are just noted, everything else is positional
+    opts = {}
+    flags = set()
     positional = []
-    for i, a in enumerate(args):
-        if skip_next:
-            skip_next = False
-            continue
-        if a in ("--type", "--interval", "--dir", "-d"):
-            skip_next = True
+    i = 0
+    while i < len(args):
+        a = args[i]
+        if a in VALUE_FLAGS:
+            if i + 1 < len(args):
+                opts[VALUE_FLAGS[a]] = args[i + 1]
+            i += 2
             continue
-        if not a.startswith("-"):
+        if a.startswith("-"):
+            flags.add(a)
+        else:
             positional.append(a)
+        i += 1
+
+    # Apply --dir first (for cross-project messaging)
+    target_dir = opts.get("dir")
+    if target_dir:
+        # Resolve relative to /tmp/nclaude/ if just a name, otherwise use as path
+        if "/" not in target_dir:
+            set_base_dir(f"/tmp/nclaude/{target_dir}")
+        else:
+            # It's a path - get the git repo name from it. The .git walk
+            # would happily climb from a missing directory into an enclosing
+            # repo, where git -C just fails, so only existing ones are looked up
+            target = os.path.abspath(target_dir)
+            repo_name = _git_info(target)[1] if os.path.isdir(target) else None
+            # Not a git repo, use directory name
+            set_base_dir(f"/tmp/nclaude/{repo_name or Path(target_dir).name}")
+
+    # Parse flags
+    quiet = "--quiet" in flags or "-q" in flags
+    all_msgs = "--all" in flags
+
+    # --type is used by the send command
+    msg_type = opts.get("type", "MSG").upper()
 
     try:
         if cmd == "init":
@@ -713,103 +1069,49 @@ def main():
             }
         elif cmd == "listen":
             session_id = positional[0] if positional else get_auto_session_id()
-            # Parse --interval flag
-            interval = 5
-            for i, arg in enumerate(args):
-                if arg == "--interval" and i + 1 < len(args):
-                    try:
-                        interval = int(args[i + 1])
-                    except ValueError:
-                        pass
-            listen(session_id, interval)
+            listen(session_id, _opt(opts, "interval", int, 5))
             result = None  # listen handles its own output
 
         elif cmd == "watch":
-            # Parse --timeout flag (default 60s)
-            timeout = 60
-            for i, arg in enumerate(args):
-                if arg == "--timeout" and i + 1 < len(args):
-                    try:
-                        timeout = int(args[i + 1])
-                    except ValueError:
-                        pass
-            # Parse --interval flag (default 1.0s)
-            interval = 1.0
-            for i, arg in enumerate(args):
-                if arg == "--interval" and i + 1 < len(args):
-                    try:
-                        interval = float(args[i + 1])
-                    except ValueError:
-                        pass
-            # Parse --history flag (default 0 = no history)
-            history = 0
-            for i, arg in enumerate(args):
-                if arg == "--history" and i + 1 < len(args):
-                    try:
-                        history = int(args[i + 1])
-                    except ValueError:
-                        pass
-            watch(timeout, interval, history)
+            watch(
+                _opt(opts, "timeout", int, 60),  # 0 = forever
+                _opt(opts, "interval", float, 1.0),
+                _opt(opts, "history", int, 0),  # 0 = no history
+            )
             result = None  # watch handles its own output
 
-        # Hub commands - delegate to hub.py and client.py
+        # Hub commands - call into hub.py and client.py in-process
         elif cmd == "hub":
-            import subprocess
-            hub_script = Path(__file__).parent / "hub.py"
             subcmd = positional[0] if positional else "status"
-            proc = subprocess.run(
-                ["python3", str(hub_script), subcmd],
-                capture_output=True, text=True
-            )
-            if proc.stdout:
-                result = json.loads(proc.stdout)
+            if subcmd == "status":
+                result = _load_script("hub").get_hub_status()
+            elif subcmd == "stop":
+                result = _load_script("hub").stop_hub()
             else:
-                result = {"error": proc.stderr}
+                # "start" runs the hub itself, so it stays a separate process
+                hub_script = Path(__file__).parent / "hub.py"
+                proc = subprocess.run(
+                    ["python3", str(hub_script), subcmd],
+                    capture_output=True, text=True
+                )
+                if proc.stdout:
+                    result = json.loads(proc.stdout)
+                else:
+                    result = {"error": proc.stderr}
 
         elif cmd == "connect":
-            import subprocess
-            client_script = Path(__file__).parent / "client.py"
             session_id = positional[0] if positional else get_auto_session_id()
-            proc = subprocess.run(
-                ["python3", str(client_script), "connect", session_id],
-                capture_output=True, text=True
-            )
-            if proc.stdout:
-                result = json.loads(proc.stdout)
-            else:
-                result = {"error": proc.stderr}
+            result = _load_script("client").get_client(session_id).connect()
 
         elif cmd == "hsend":  # hub send (real-time)
-            import subprocess
-            client_script = Path(__file__).parent / "client.py"
             message = " ".join(positional) if positional else ""
             if not message:
                 result = {"error": "No message provided"}
             else:
-                proc = subprocess.run(
-                    ["python3", str(client_script), "send", message],
-                    capture_output=True, text=True
-                )
-                if proc.stdout:
-                    result = json.loads(proc.stdout)
-                else:
-                    result = {"error": proc.stderr}
+                result = _load_script("client").send_message(message)
 
         elif cmd == "hrecv":  # hub receive (real-time)
-            import subprocess
-            client_script = Path(__file__).parent / "client.py"
-            timeout = "5"
-            for i, arg in enumerate(args):
-                if arg == "--timeout" and i + 1 < len(args):
-                    timeout = args[i + 1]
-            proc = subprocess.run(
-                ["python3", str(client_script), "recv", "--timeout", timeout],
-                capture_output=True, text=True
-            )
-            if proc.stdout:
-                result = json.loads(proc.stdout)
-            else:
-                result = {"error": proc.stderr}
+            result = _load_script("client").recv_message(_opt(opts, "timeout", float, 5.0))
 
         elif cmd == "chat":
             # Interactive human chat mode
@@ -836,14 +1138,69 @@ def main():
                 print("\nGoodbye!")
             result = None  # Don't print JSON at end
 
+        elif cmd == "multi":
+            # Several commands, one process: "hub.status" runs "hub status"
+            result = {}
+            for spec in positional:
+                name, _, sub = spec.partition(".")
+                if name in INTERACTIVE_COMMANDS:
+                    result[spec] = {"error": f"{name} is interactive, run it on its own"}
+                else:
+                    result[spec] = run_command(name, [sub] if sub else [])
+
         else:
             result = {"error": f"Unknown command: {cmd}"}
     except Exception as e:
         result = {"error": str(e)}
 
+    return result
+
+
+def cli_main(argv):
+    """Run a command in-process and return its result (used by the MCP server).
+
+    Unlike main(), nothing is printed. Each call starts from fresh git info
+    and BASE, as a separate nclaude process would, so --dir only applies to
+    that call and a branch switch or new checkout shows up in the next one.
+    """
+    if not argv:
+        return {"error": "No command provided"}
+    if argv[0] in INTERACTIVE_COMMANDS:
+        return {"error": f"{argv[0]} is interactive, run it from a terminal"}
+
+    # The checkout may have changed since the last call
+    _git_info.cache_clear()
+    set_base_dir(get_base_dir())
+
+    result = run_command(argv[0], list(argv[1:]))
+    return result if result is not None else {"status": "ok"}
+
+
+def format_result(result, pretty):
+    """JSON text for a command result: indented for people, compact for pipes
+
+    Non-ASCII text is written as-is either way, as orjson does.
+    """
+    if pretty:
+        return json.dumps(result, indent=2, ensure_ascii=False)
+    if orjson is not None:
+        try:
+            return orjson.dumps(result).decode()
+        except TypeError:
+            pass
+    return json.dumps(result, separators=(",", ":"), ensure_ascii=False)
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] in ("-h", "--help", "help"):
+        show_help()
+        sys.exit(0)
+
+    result = run_command(sys.argv[1], sys.argv[2:])
+
     # In quiet mode, only print if there's something to say
     if result is not None:
-        print(json.dumps(result, indent=2))
+        print(format_result(result, sys.stdout.isatty()))
 
 
 if __name__ == "__main__":
@@ -7,6 +7,7 @@ Run: pytest scripts/test_hub_client.py -v
 
 import json
 import os
+import selectors
 import signal
 import socket
 import subprocess
@@ -22,7 +23,7 @@ import pytest
 # Add scripts to path
 sys.path.insert(0, str(Path(__file__).parent))
 
-from client import HubClient, parse_mentions
+from client import HubClient, parse_mentions, send_datagram, send_message
 from hub import MessageHub, get_hub_status, stop_hub
 
 
@@ -98,6 +99,34 @@ class TestMessageHub:
         hub = MessageHub(socket_path=custom_path)
         assert hub.socket_path == custom_path
 
+    def test_send_buffers_when_socket_is_full(self):
+        """Output the kernel won't take yet is queued, not dropped"""
+        hub = MessageHub()
+        hub_end, peer = socket.socketpair()
+        hub_end.setblocking(False)
+        hub.client_sessions[hub_end] = "slow"
+        hub.selector.register(hub_end, selectors.EVENT_READ)
+
+        payload = b"x" * (4 * 1024 * 1024) + b"\n"
+        hub._send_bytes(hub_end, payload)
+        assert hub_end in hub.out_buffers
+        assert hub.selector.get_key(hub_end).events & selectors.EVENT_WRITE
+
+        received = bytearray()
+        peer.setblocking(False)
+        while len(received) < len(payload):
+            try:
+                received += peer.recv(1 << 20)
+            except BlockingIOError:
+                hub._flush_client(hub_end)
+
+        assert bytes(received) == payload
+        assert hub_end not in hub.out_buffers
+        assert hub.selector.get_key(hub_end).events == selectors.EVENT_READ
+
+        hub_end.close()
+        peer.close()
+
 
 class TestHubStatusFunctions:
     """Test hub status helper functions"""
@@ -182,6 +211,42 @@ class TestHubClientIntegration:
         client_a.disconnect()
         client_b.disconnect()
 
+    def test_reregister_replaces_old_connection(self, running_hub, hub_socket):
+        """Registering an already-connected session takes over its slot"""
+        observer = HubClient("observer", socket_path=hub_socket)
+        first = HubClient("same-id", socket_path=hub_socket)
+        second = HubClient("same-id", socket_path=hub_socket)
+
+        observer.connect()
+        assert first.connect().get("connected") is True
+        first_sock = running_hub.clients["same-id"]
+        time.sleep(0.3)
+        observer.recv_all()
+
+        result = second.connect()
+        assert result.get("connected") is True
+        assert sorted(result.get("online")) == ["observer", "same-id"]
+
+        # The hub closed the first connection and hands its slot to the second
+        first.recv_thread.join(timeout=2)
+        assert not first.recv_thread.is_alive()
+        assert first_sock.fileno() == -1
+        second_sock = running_hub.clients["same-id"]
+        assert second_sock is not first_sock
+        assert running_hub.client_sessions[second_sock] == "same-id"
+
+        # Messages for the session reach the second client
+        observer.send("still there?", to=["same-id"])
+        time.sleep(0.3)
+        assert "still there?" in [m.get("body") for m in second.recv_all()]
+
+        # The session never left, so nobody was told it did
+        assert not [m for m in observer.recv_all() if m.get("type") == "LEAVE"]
+
+        first.disconnect()
+        second.disconnect()
+        observer.disconnect()
+
     def test_send_message_broadcast(self, running_hub, hub_socket):
         """Client can send broadcast message"""
         client_a = HubClient("sender", socket_path=hub_socket)
@@ -197,6 +262,8 @@ class TestHubClientIntegration:
         # Send broadcast
         result = client_a.send("Hello everyone!")
         assert result.get("sent") is True
+        assert result.get("id", "").startswith("sender-")
+        assert not [m for m in client_a.recv_all() if m.get("type") == "SENT"]
 
         # Receiver should get it
         time.sleep(0.3)
@@ -247,6 +314,88 @@ class TestHubClientIntegration:
         client_b.disconnect()
         client_c.disconnect()
 
+    def test_message_split_across_writes(self, running_hub, hub_socket):
+        """Hub reassembles a line that arrives in several recv() chunks"""
+        raw = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        raw.connect(str(hub_socket))
+        raw.settimeout(2.0)
+
+        line = json.dumps({"type": "REGISTER", "session_id": "split-client"}).encode() + b"\n"
+        raw.sendall(line[:10])
+        time.sleep(0.2)
+        raw.sendall(line[10:])
+
+        response = json.loads(raw.recv(65536).split(b"\n")[0])
+        assert response.get("type") == "REGISTERED"
+        assert response.get("session_id") == "split-client"
+
+        raw.close()
+
+    def test_send_datagram(self, running_hub, hub_socket):
+        """One-shot datagram sends are routed without registering"""
+        receiver = HubClient("dgram-receiver", socket_path=hub_socket)
+        receiver.connect()
+        time.sleep(0.2)
+        receiver.recv_all()
+
+        result = send_datagram("dgram-sender", "fire and forget", socket_path=hub_socket)
+        assert result.get("sent") is True
+
+        msg = receiver.recv(timeout=2.0)
+        assert msg is not None
+        assert msg.get("body") == "fire and forget"
+        assert msg.get("from") == "dgram-sender"
+
+        receiver.disconnect()
+
+    def test_malformed_datagrams_are_dropped(self, running_hub, hub_socket):
+        """Bad datagrams neither crash the hub nor leak a req_id"""
+        receiver = HubClient("dgram-receiver", socket_path=hub_socket)
+        receiver.connect()
+        time.sleep(0.2)
+        receiver.recv_all()
+
+        dgram_path = str(hub_socket.with_suffix(".dgram"))
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        for bad in (
+            {"from": "a", "to": 5, "body": "x"},
+            {"from": ["a"], "body": "x"},
+            {"from": "a", "to": ["ok", 7], "body": "x"},
+        ):
+            sock.sendto(json.dumps(bad).encode(), dgram_path)
+        sock.sendto(json.dumps({"from": "a", "body": "still up", "req_id": "1"}).encode(), dgram_path)
+        sock.close()
+
+        msg = receiver.recv(timeout=2.0)
+        assert msg is not None
+        assert msg.get("body") == "still up"
+        assert "req_id" not in msg
+
+        receiver.disconnect()
+
+    def test_send_datagram_no_hub(self):
+        """send_datagram reports unavailability so callers can fall back"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            assert send_datagram("x", "hi", socket_path=Path(tmpdir) / "test.sock") is None
+
+    def test_send_message_parses_mentions(self, running_hub, hub_socket):
+        """send_message delivers @mentioned messages as this session"""
+        receiver = HubClient("helper-target", socket_path=hub_socket)
+        receiver.connect()
+        time.sleep(0.2)
+        receiver.recv_all()
+
+        with patch.dict(os.environ, {"NCLAUDE_ID": "helper-sender"}):
+            result = send_message("@helper-target ping", socket_path=hub_socket)
+        assert result.get("sent") is True
+
+        msg = receiver.recv(timeout=2.0)
+        assert msg is not None
+        assert msg.get("body") == "ping"
+        assert msg.get("from") == "helper-sender"
+
+        receiver.disconnect()
+
     def test_recv_timeout(self, running_hub, hub_socket):
         """Recv returns None on timeout"""
         client = HubClient("solo", socket_path=hub_socket)
@@ -25,6 +25,7 @@ STATE_FILE = NCLAUDE_DIR / "gchat_state.json"
 
 # Message tag pattern
 TAG_PATTERN = r"\[NCLAUDE:([^:]+):([^:]+):([^\]]+)\]\s*(.+)"
+_TAG_RE = re.compile(TAG_PATTERN, re.DOTALL)
 
 
 class GChatTransport:
@@ -48,7 +49,7 @@ class GChatTransport:
 
     def parse_tag(self, text: str) -> Optional[dict]:
         """Parse nclaude tag from message text."""
-        match = re.match(TAG_PATTERN, text, re.DOTALL)
+        match = _TAG_RE.match(text)
         if not match:
             return None
         return {
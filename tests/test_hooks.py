@@ -0,0 +1,240 @@
+"""Tests for the Claude Code plugin hooks."""
+
+import importlib.util
+import re
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+HOOKS_DIR = Path(__file__).parent.parent / "plugin" / "hooks"
+sys.path.insert(0, str(HOOKS_DIR))
+
+
+def load_hook(name):
+    """Import a hook script (hyphenated file name) as a module."""
+    spec = importlib.util.spec_from_file_location(name.replace("-", "_"), HOOKS_DIR / f"{name}.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="module")
+def precompact():
+    return load_hook("precompact-save")
+
+
+class TestPrecompactScan:
+    """Tests for the PreCompact transcript scanner."""
+
+    def findall(self, precompact, transcript):
+        """What one findall() per bucket pattern returns."""
+        return {name: re.findall(p, transcript) for name, (p, _) in precompact._BUCKET_SPECS.items()}
+
+    def test_matches_findall(self, precompact):
+        """Test single-pass scan agrees with per-pattern findall."""
+        transcript = (
+            "I'm working on: the transcript scanner today\n"
+            "TODO: add more tests here\n"
+            "CLAIMING: src/a.py\nCLAIMING: src/b.py\nRELEASED: src/a.py\n"
+            "we should: keep this fast enough\n"
+        )
+        assert precompact.scan_transcript(transcript) == self.findall(precompact, transcript)
+
+    def test_overlapping_anchors(self, precompact):
+        """Test an anchor starting inside another is still found."""
+        transcript = "mustodo: write the overlap test\nneed todo: check me too\n"
+        hits = precompact.scan_transcript(transcript)
+        assert hits == self.findall(precompact, transcript)
+        assert hits["todo"] == ["write the overlap test", "check me too"]
+
+    def test_large_transcript_file(self, precompact, tmp_path):
+        """Test an on-disk transcript scans like the same text inline."""
+        text = "TODO: " + "é" * 150 + "\nTODO: Ünïcode item\n" + "x" * (1 << 20)
+        path = tmp_path / "transcript.txt"
+        path.write_text(text, encoding="utf-8")
+
+        transcript = precompact.read_transcript({"transcript_path": str(path)})
+        hits = precompact.scan_transcript(transcript)
+        assert hits == self.findall(precompact, text)
+        assert hits["todo"] == ["é" * 100, "Ünïcode item"]
+
+    def test_scan_is_single_pass(self, precompact, monkeypatch):
+        """Test the scan walks the transcript once and only tries patterns at anchors."""
+        calls = {"finditer": 0, "match": [], "search": []}
+
+        class Recorder:
+            def __init__(self, compiled, name=None):
+                self.compiled, self.name = compiled, name
+
+            def finditer(self, text):
+                calls["finditer"] += 1
+                return self.compiled.finditer(text)
+
+            def match(self, text, pos):
+                calls["match"].append((self.name, pos))
+                return self.compiled.match(text, pos)
+
+            def search(self, text, pos, endpos):
+                calls["search"].append(endpos - pos)
+                return self.compiled.search(text, pos, endpos)
+
+        monkeypatch.setattr(precompact, "_ANCHOR_RE", Recorder(precompact._ANCHOR_RE))
+        monkeypatch.setattr(precompact, "_ANCHOR_AT", Recorder(precompact._ANCHOR_AT))
+        monkeypatch.setattr(
+            precompact, "_BUCKETS", {n: Recorder(p, n) for n, p in precompact._BUCKETS.items()}
+        )
+
+        chunk = (
+            "Let me: look at the daemon socket handling\n"
+            "TODO: fix the flaky test in the hub\n"
+            "we mustodo: keep hooks under their timeout\n"
+            + "filler ünïcödé text " * 20 + "\n"
+        )
+        transcript = chunk * 500
+        precompact.scan_transcript(transcript)
+
+        # One pass over the whole transcript
+        assert calls["finditer"] == 1
+        # Bucket patterns only run at anchor offsets, each at most once
+        anchors = sum(
+            len(re.findall("(?i)(?=" + "|".join(map(re.escape, literals)) + ")", transcript))
+            for _, literals in precompact._BUCKET_SPECS.values()
+        )
+        assert len(calls["match"]) == len(set(calls["match"])) <= anchors
+        # Overlap checks only look at a few characters past each hit
+        assert max(calls["search"]) <= 2 * precompact._ANCHOR_MAX
+
+
+class TestSubagentStopDiff:
+    """Tests for the SubagentStop hook's modified-file list."""
+
+    @pytest.fixture
+    def hook(self):
+        pytest.importorskip("pygit2")
+        return load_hook("subagent-stop")
+
+    def git(self, *args):
+        return subprocess.run(
+            ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+            capture_output=True, text=True, check=True,
+        ).stdout
+
+    def git_names(self, *args):
+        return sorted(self.git("diff", "--name-only", *args).split())
+
+    def test_matches_git_diff_head_parent(self, hook, tmp_path, monkeypatch):
+        """Test pygit2 lists what `git diff --name-only HEAD~1` does."""
+        monkeypatch.chdir(tmp_path)
+        self.git("init", "-q")
+        for name in ("a", "c", "reverted", "gone"):
+            (tmp_path / name).write_text(f"{name}\n")
+        (tmp_path / "old").write_text("".join(f"{i}\n" for i in range(50)))
+        self.git("add", ".")
+        self.git("commit", "-qm", "one")
+        (tmp_path / "b").write_text("b\n")
+        self.git("add", "b")
+        self.git("commit", "-qm", "two")
+
+        (tmp_path / "a").write_text("changed\n")
+        (tmp_path / "staged_new").write_text("new\n")
+        (tmp_path / "reverted").write_text("staged\n")
+        self.git("add", "staged_new", "reverted")
+        (tmp_path / "reverted").write_text("reverted\n")
+        (tmp_path / "gone").unlink()
+        self.git("mv", "old", "renamed")
+        (tmp_path / "untracked").write_text("x\n")
+
+        expected = self.git_names("HEAD~1")
+        assert "staged_new" in expected and "b" in expected
+        assert sorted(hook._diff_names_pygit2()) == expected
+
+    def test_matches_git_diff_cached_without_parent(self, hook, tmp_path, monkeypatch):
+        """Test a single-commit repo lists the staged files, like --cached."""
+        monkeypatch.chdir(tmp_path)
+        self.git("init", "-q")
+        (tmp_path / "a").write_text("a\n")
+        self.git("add", "a")
+        self.git("commit", "-qm", "one")
+        (tmp_path / "a").write_text("staged\n")
+        (tmp_path / "b").write_text("b\n")
+        self.git("add", "a", "b")
+
+        assert sorted(hook._diff_names_pygit2()) == self.git_names("--cached")
+
+    def test_sender_id_matches_git(self, hook, tmp_path, monkeypatch):
+        """Test pygit2 derives the same sender ID as the git CLI fallback."""
+        repo_dir = tmp_path / "myrepo"
+        repo_dir.mkdir()
+        monkeypatch.chdir(repo_dir)
+        monkeypatch.delenv("NCLAUDE_ID", raising=False)
+        self.git("init", "-q", "-b", "feature/x")
+        unborn = hook.get_sender_id()
+        (repo_dir / "a").write_text("a\n")
+        self.git("add", "a")
+        self.git("commit", "-qm", "one")
+        self.git("checkout", "-q", "--detach")
+        detached = hook.get_sender_id()
+
+        monkeypatch.setattr(hook, "pygit2", None)
+        assert detached == hook.get_sender_id() == "myrepo/-1"
+        self.git("checkout", "-q", "feature/x")
+        assert unborn == hook.get_sender_id() == "myrepo/feature-x-1"
+
+        monkeypatch.setenv("NCLAUDE_ID", "explicit")
+        assert hook.get_sender_id() == "explicit"
+
+
+class TestDaemon:
+    """Tests for the hook daemon's request loop."""
+
+    @pytest.fixture
+    def daemon(self, tmp_path, monkeypatch):
+        import _nclaude_daemon as daemon
+
+        db_path = tmp_path / "messages.db"
+        conn = sqlite3.connect(db_path)
+        conn.execute(
+            "CREATE TABLE messages (id INTEGER PRIMARY KEY, room TEXT, session_id TEXT,"
+            " msg_type TEXT, content TEXT, timestamp TEXT, recipient TEXT)"
+        )
+        conn.commit()
+        conn.close()
+
+        monkeypatch.setattr(daemon, "DB_PATH", str(db_path))
+        monkeypatch.setattr(daemon, "STATE_DIR", str(tmp_path))
+        monkeypatch.setattr(daemon, "SOCK_PATH", str(tmp_path / "sock"))
+        monkeypatch.setattr(daemon, "LOCK_PATH", str(tmp_path / "sock.lock"))
+        monkeypatch.setattr(daemon, "IDLE_TIMEOUT", 1.0)
+        monkeypatch.setattr(daemon, "spawn", lambda: None)
+
+        thread = threading.Thread(target=daemon.serve, daemon=True)
+        thread.start()
+        for _ in range(50):
+            if (tmp_path / "sock").exists():
+                break
+            time.sleep(0.1)
+        yield daemon
+        # Let it idle out while the paths still point into tmp_path
+        thread.join(timeout=5)
+
+    def raw_request(self, daemon, payload):
+        sock = socket.socket(socket.AF_UNIX, daemon.SOCK_TYPE)
+        sock.settimeout(2)
+        try:
+            sock.connect(daemon.SOCK_PATH)
+            sock.sendall(payload)
+            return daemon._recv_line(sock)
+        finally:
+            sock.close()
+
+    @pytest.mark.parametrize("payload", [b"[1, 2]\n", b'"op"\n', b'{"op": "new_count", "last": []}\n'])
+    def test_bad_request_gets_error_and_daemon_survives(self, daemon, payload):
+        """Test a malformed request is answered with an error, not a crash."""
+        assert "error" in daemon.loads(self.raw_request(daemon, payload))
+        assert daemon.request({"op": "new_count", "last": 0}) == {"count": 0}